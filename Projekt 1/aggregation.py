@@ -0,0 +1,141 @@
+import numpy as np
+import pandas as pd
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M"
+
+PORY_DOBY = ["dzień", "noc"]
+KLUCZE = ["wojewodztwo", "powiat", "pora_doby"]
+
+# odczyty powyżej limitu to błędy pomiaru
+LIMITY = {"wiatr": 100}
+
+# wierszy CSV w jednej paczce w trybie strumieniowym
+CHUNK_ROWS = 500000
+
+
+def _read_csv(path, **kwargs):
+    return pd.read_csv(
+        path,
+        sep=";",
+        header=None,
+        usecols=[0, 1, 2, 3],
+        names=["kod_stacji", "param", "data", "wartosc"],
+        decimal=",",
+        dtype={"kod_stacji": "category", "param": "category", "data": str},
+        encoding="utf-8-sig",
+        **kwargs
+    )
+
+def _parse(df):
+    df["data"] = pd.to_datetime(df["data"], format=DATE_FORMAT, errors="coerce")
+    df["wartosc"] = pd.to_numeric(df["wartosc"], errors="coerce")
+    return df.dropna()
+
+
+def read_meteo(path):
+    return _parse(_read_csv(path))
+
+def iter_meteo(path, chunksize=CHUNK_ROWS):
+    # ten sam odczyt co read_meteo, ale paczkami – pamięć zależy od chunksize
+    with _read_csv(path, chunksize=chunksize) as reader:
+        for df in reader:
+            yield _parse(df)
+
+
+def pora_doby(data):
+    # dzień 6:00–17:59, reszta to noc
+    hour = data.dt.hour.to_numpy()
+    codes = np.where((hour >= 6) & (hour < 18), 0, 1)
+    return pd.Categorical.from_codes(codes, PORY_DOBY)
+
+
+def attach_regions(df, lookup):
+    """
+    Dokleja wojewodztwo i powiat z tabeli stacji: indeks lookup liczony raz
+    na kod stacji (kategorię), nie na odczyt. Odczyty stacji spoza tabeli
+    są odrzucane.
+    """
+    cat = df["kod_stacji"].cat
+    rows = lookup.index.get_indexer(cat.categories.astype(str))
+    codes = cat.codes.to_numpy()
+    idx = np.where(codes >= 0, rows[codes], -1) if len(rows) else np.full(len(df), -1)
+
+    keep = idx >= 0
+    df = df.loc[keep].copy()
+    idx = idx[keep]
+
+    for col in ("wojewodztwo", "powiat"):
+        c = lookup[col].array
+        df[col] = pd.Categorical.from_codes(c.codes[idx], c.categories)
+    return df
+
+
+def partial(df, keys=KLUCZE):
+    # agregaty, które da się łączyć między paczkami: suma zamiast średniej
+    return df.groupby(keys, observed=True, sort=True)["wartosc"].agg(
+        suma="sum",
+        min="min",
+        max="max",
+        liczba="count"
+    )
+
+def combine(acc, part):
+    if acc is None:
+        return part
+
+    keys = list(acc.index.names)
+    g = pd.concat([acc, part]).groupby(level=keys, observed=True, sort=True)
+    return pd.DataFrame({
+        "suma": g["suma"].sum(),
+        "min": g["min"].min(),
+        "max": g["max"].max(),
+        "liczba": g["liczba"].sum()
+    })
+
+def aggregate(df, nazwa):
+    return finalize(partial(df), nazwa)
+
+def finalize(acc, nazwa):
+    grp = acc.reset_index()
+    grp["suma"] = grp["suma"] / grp["liczba"]
+    grp = grp.rename(columns={"suma": "srednia"})
+
+    for col in acc.index.names:
+        grp[col] = grp[col].astype(str)
+    if nazwa is not None:
+        grp["parametr"] = nazwa
+    return grp
+
+
+def _prepare(df, nazwa, lookup):
+    if nazwa in LIMITY:
+        df = df[df["wartosc"] < LIMITY[nazwa]]
+
+    lo, hi = df["wartosc"].min(), df["wartosc"].max()
+
+    df = attach_regions(df, lookup)
+    df["pora_doby"] = pora_doby(df["data"])
+    return df, lo, hi
+
+
+def process_file(path, nazwa, lookup, chunksize=None):
+    """
+    Statystyki jednego pliku IMGW. Z chunksize plik jest czytany paczkami,
+    a wynik składany z bieżących sum/min/max/liczności – pamięć nie rośnie
+    z wielkością pliku, wynik jest taki sam jak przy wczytaniu całości.
+    """
+    if chunksize is None:
+        df, lo, hi = _prepare(read_meteo(path), nazwa, lookup)
+        print(f"   {nazwa}: min={lo} max={hi}")
+        return aggregate(df, nazwa)
+
+    acc = None
+    lo, hi = np.nan, np.nan
+    for chunk in iter_meteo(path, chunksize):
+        df, c_lo, c_hi = _prepare(chunk, nazwa, lookup)
+        lo, hi = np.fmin(lo, c_lo), np.fmax(hi, c_hi)
+        acc = combine(acc, partial(df))
+
+    print(f"   {nazwa}: min={lo} max={hi}")
+    return finalize(acc, nazwa)
@@ -0,0 +1,239 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from aggregation import _prepare, read_meteo, iter_meteo, partial, finalize, KLUCZE
+from jobs import discover
+
+
+CACHE_DIR = r"meteo_cache"
+# podkreślnik – pyarrow pomija go przy odczycie katalogu jako zbioru danych
+MANIFEST = "_manifest.json"
+
+# wierszy w grupie Parquet – mniejsze grupy = dokładniejsze pomijanie po statystykach
+ROW_GROUP = 100000
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+
+# odczyty po parsowaniu, limitach i doklejeniu regionów; parametr i okres
+# są w ścieżce partycji (parametr=.../okres=...), nie w pliku
+SCHEMA = pa.schema([
+    ("kod_stacji", _DICT),
+    ("data", pa.timestamp("ns")),
+    ("wartosc", pa.float64()),
+    ("wojewodztwo", _DICT),
+    ("powiat", _DICT),
+    ("pora_doby", _DICT)
+])
+
+
+def file_hash(path, block=1 << 20):
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def lookup_hash(lookup):
+    # odczyty są zapisywane już z regionami – inna tabela stacji unieważnia cały cache
+    h = pd.util.hash_pandas_object(lookup.astype(str), index=True)
+    return hashlib.sha1(h.to_numpy().tobytes()).hexdigest()
+
+
+def _read_manifest(cache_dir):
+    path = os.path.join(cache_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"lookup": None, "pliki": {}}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def _write_manifest(cache_dir, manifest):
+    path = os.path.join(cache_dir, MANIFEST)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+
+def _part_path(job):
+    # jeden plik Parquet na plik źródłowy, nazwa od ścieżki źródła;
+    # względem katalogu cache, żeby cache dało się przenieść
+    name = hashlib.sha1(os.path.abspath(job["path"]).encode()).hexdigest()[:16]
+    return os.path.join(f"parametr={job['parametr']}", f"okres={job['okres']}", f"{name}.parquet")
+
+def _to_table(df):
+    # posortowane po regionie – statystyki grup wierszy pozwalają pominąć
+    # całe grupy przy filtrze na wojewodztwo/powiat
+    df = df.sort_values(["wojewodztwo", "powiat", "data"])
+    return pa.Table.from_pandas(df[SCHEMA.names], schema=SCHEMA, preserve_index=False)
+
+
+_lookup = None
+
+def _init_worker(lookup):
+    global _lookup
+    _lookup = lookup
+
+def _parse_job(job):
+    """
+    Parsuje jeden plik źródłowy do Parquet. Z chunksize plik jest czytany
+    paczkami i każda paczka dopisywana jako osobne grupy wierszy.
+    """
+    print(f"▶ Parsowanie: {job['parametr']} {job['okres']} ({job['path']})")
+    out = os.path.join(job["cache_dir"], job["cel"])
+    os.makedirs(os.path.dirname(out), exist_ok=True)
+    # kropka na początku – niedokończony plik nie trafi do odczytu katalogu
+    tmp = os.path.join(os.path.dirname(out), "." + os.path.basename(out))
+
+    if job["chunksize"] is None:
+        chunks = [read_meteo(job["path"])]
+    else:
+        chunks = iter_meteo(job["path"], job["chunksize"])
+
+    with pq.ParquetWriter(tmp, SCHEMA) as writer:
+        for chunk in chunks:
+            df, _, _ = _prepare(chunk, job["parametr"], _lookup)
+            writer.write_table(_to_table(df), row_group_size=ROW_GROUP)
+
+    os.replace(tmp, out)
+    return job["path"]
+
+
+def refresh(root, parametry, lookup, cache_dir=CACHE_DIR, workers=None, chunksize=None):
+    """
+    Uzupełnia cache Parquet o nowe i zmienione pliki źródłowe. Plik jest
+    parsowany ponownie tylko gdy zmienił się jego skrót – przy tym samym
+    mtime i rozmiarze skrót nie jest nawet liczony. Wpisy plików, których
+    już nie ma, są usuwane razem z ich Parquet.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest = _read_manifest(cache_dir)
+
+    l_hash = lookup_hash(lookup)
+    if manifest["lookup"] != l_hash:
+        if manifest["pliki"]:
+            print("▶ Zmieniona tabela stacji – przebudowa cache")
+        for name in os.listdir(cache_dir):
+            if name.startswith("parametr="):
+                shutil.rmtree(os.path.join(cache_dir, name))
+        manifest = {"lookup": l_hash, "pliki": {}}
+
+    pliki = manifest["pliki"]
+    found = {os.path.abspath(job["path"]): job for job in discover(root, parametry)}
+
+    for key in set(pliki) - set(found):
+        cel = os.path.join(cache_dir, pliki.pop(key)["cel"])
+        if os.path.exists(cel):
+            os.remove(cel)
+            # puste katalogi partycji w górę, aż do katalogu cache (manifest)
+            try:
+                os.removedirs(os.path.dirname(cel))
+            except OSError:
+                pass
+
+    stale = []
+    for key, job in found.items():
+        st = os.stat(job["path"])
+        entry = pliki.get(key)
+        if entry and os.path.exists(os.path.join(cache_dir, entry["cel"])):
+            if entry["mtime"] == st.st_mtime_ns and entry["rozmiar"] == st.st_size:
+                continue
+            h = file_hash(job["path"])
+            if entry["sha1"] == h:
+                entry["mtime"] = st.st_mtime_ns
+                continue
+        else:
+            h = file_hash(job["path"])
+
+        job.update(
+            cel=_part_path(job), cache_dir=cache_dir, chunksize=chunksize,
+            sha1=h, mtime=st.st_mtime_ns
+        )
+        stale.append(job)
+
+    if stale:
+        t0 = time.perf_counter()
+        workers = min(workers or os.cpu_count() or 1, len(stale))
+        if workers > 1:
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(lookup,)) as pool:
+                list(pool.map(_parse_job, stale))
+        else:
+            _init_worker(lookup)
+            for job in stale:
+                _parse_job(job)
+        print(f"▶ Cache: {len(stale)} plików sparsowanych w {time.perf_counter() - t0:.2f} s")
+    else:
+        print("▶ Cache aktualny")
+
+    for job in stale:
+        pliki[os.path.abspath(job["path"])] = {
+            "parametr": job["parametr"],
+            "okres": job["okres"],
+            "cel": job["cel"],
+            "mtime": job["mtime"],
+            "rozmiar": job["rozmiar"],
+            "sha1": job["sha1"]
+        }
+    _write_manifest(cache_dir, manifest)
+
+    return len(stale)
+
+
+def _filters(**kwargs):
+    # None lub brak = bez filtra, lista = "in", pojedyncza wartość = "=="
+    out = []
+    for col, val in kwargs.items():
+        if val is None:
+            continue
+        if isinstance(val, (list, tuple, set)):
+            out.append((col, "in", list(val)))
+        else:
+            out.append((col, "==", val))
+    return out or None
+
+
+def load(cache_dir=CACHE_DIR, columns=None, **where):
+    """
+    Odczyty z cache, np. load(parametr="opad", wojewodztwo="mazowieckie").
+    Filtry na parametr/okres wybierają katalogi partycji, filtry na
+    pozostałe kolumny pomijają grupy wierszy po statystykach min/max.
+    """
+    if not os.path.isdir(cache_dir) or not any(
+        name.startswith("parametr=") for name in os.listdir(cache_dir)
+    ):
+        return pd.DataFrame(columns=SCHEMA.names + ["parametr", "okres"])
+
+    return pd.read_parquet(
+        cache_dir,
+        engine="pyarrow",
+        columns=columns,
+        filters=_filters(**where)
+    )
+
+
+def aggregate_cached(keys=KLUCZE, cache_dir=CACHE_DIR, **where):
+    """
+    Statystyki per (parametr, okres, *keys) prosto z cache – ponowna agregacja
+    z innym grupowaniem bez parsowania CSV. Liczności, min i max jak
+    w run_jobs, srednia w granicach 1 ulp (inna kolejność sumowania).
+    """
+    keys = list(keys)
+    by = ["parametr", "okres"] + keys
+    df = load(cache_dir, columns=by + ["wartosc"], **where)
+    if df.empty:
+        return pd.DataFrame()
+
+    for col in by:
+        if not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+
+    # kolejność kolumn jak w run_jobs
+    grp = finalize(partial(df, by), None)
+    return grp[keys + ["srednia", "min", "max", "liczba", "parametr", "okres"]]
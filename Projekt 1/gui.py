@@ -16,6 +16,8 @@ from PyQt5.QtCore import Qt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 
+from jobs import merge_stats
+
 PARAM_INFO = {
     "temperatura": ("Temperatura", "°C", "tab:red"),
     "wiatr": ("Wiatr", "m/s", "tab:blue"),
@@ -52,9 +54,11 @@ def connect_redis():
 mongo_client = connect_mongo()
 redis_client = connect_redis()
 
-def redis_key(woj, powiat, params):
+WSZYSTKIE = "Wszystkie"
+
+def redis_key(woj, powiat, okres, params):
     p = ",".join(sorted(params))
-    return f"{woj}:{powiat}:{p}"
+    return f"{woj}:{powiat}:{okres}:{p}"
 
 
 def get_cached_df(key, loader_func):
@@ -78,7 +82,17 @@ def get_cached_df(key, loader_func):
 
 def load_from_mongo():
     col = mongo_client["pag_projekt"]["meteo_stats"]
-    return pd.DataFrame(list(col.find({}, {"_id": 0})))
+    df = pd.DataFrame(list(col.find({}, {"_id": 0})))
+    if "okres" not in df.columns:
+        df["okres"] = ""
+    return df
+
+def merge_months(df):
+    # kilka miesięcy -> jeden wiersz na region/porę/parametr, średnia ważona liczbą odczytów
+    keys = ["wojewodztwo", "powiat", "pora_doby", "parametr"]
+    if df.empty:
+        return df
+    return merge_stats(df, keys).assign(okres=WSZYSTKIE)
 
 class MeteoDashboard(QMainWindow):
     def __init__(self):
@@ -98,6 +112,7 @@ class MeteoDashboard(QMainWindow):
 
         self.woj_box = QComboBox()
         self.pow_box = QComboBox()
+        self.okres_box = QComboBox()
 
         self.chk_temp = QCheckBox("Temperatura [°C]")
         self.chk_wind = QCheckBox("Wiatr [m/s]")
@@ -120,6 +135,9 @@ class MeteoDashboard(QMainWindow):
         grid.addWidget(self.chk_wind, 1, 2)
         grid.addWidget(self.chk_opad, 1, 3)
 
+        grid.addWidget(QLabel("Okres:"), 2, 0)
+        grid.addWidget(self.okres_box, 2, 1)
+
         grid.addWidget(btn_load, 2, 2)
         grid.addWidget(btn_show, 2, 3)
 
@@ -153,6 +171,10 @@ class MeteoDashboard(QMainWindow):
         self.woj_box.addItems(sorted(self.data["wojewodztwo"].unique()))
         self.update_powiaty()
 
+        self.okres_box.clear()
+        self.okres_box.addItem(WSZYSTKIE)
+        self.okres_box.addItems(sorted(self.data["okres"].unique(), reverse=True))
+
         QMessageBox.information(self, "OK", "Dane wczytane")
 
     def update_powiaty(self):
@@ -172,15 +194,18 @@ class MeteoDashboard(QMainWindow):
 
         woj = self.woj_box.currentText()
         powiat = self.pow_box.currentText()
+        okres = self.okres_box.currentText()
 
-        key = redis_key(woj, powiat, params)
+        key = redis_key(woj, powiat, okres, params)
 
         def loader():
             df = self.data.copy()
             df = df[(df["parametr"].isin(params)) & (df["wojewodztwo"] == woj)]
             if powiat != "Wszystkie":
                 df = df[df["powiat"] == powiat]
-            return df
+            if okres != WSZYSTKIE:
+                return df[df["okres"] == okres]
+            return merge_months(df)
 
         self.filtered = get_cached_df(key, loader)
 
@@ -192,7 +217,7 @@ class MeteoDashboard(QMainWindow):
         df = self.filtered.copy()
         df["jednostka"] = df["parametr"].map(lambda p: PARAM_INFO[p][1])
 
-        cols = ["wojewodztwo", "powiat", "pora_doby", "parametr",
+        cols = ["wojewodztwo", "powiat", "okres", "pora_doby", "parametr",
                 "srednia", "min", "max", "liczba", "jednostka"]
 
         self.table.clear()
@@ -222,8 +247,10 @@ class MeteoDashboard(QMainWindow):
             name, unit, color = PARAM_INFO[param]
             ax = self.figure.add_subplot(1, len(params), i)
 
+            # średnia ważona liczbą odczytów, nie średnia ze średnich powiatów
             sub = self.filtered[self.filtered["parametr"] == param]
-            grp = sub.groupby("pora_doby")["srednia"].mean()
+            sub = sub.assign(_suma=sub["srednia"] * sub["liczba"]).groupby("pora_doby")
+            grp = sub["_suma"].sum() / sub["liczba"].sum()
 
             ax.bar(grp.index, grp.values, color=color, alpha=0.8)
             ax.set_title(name)
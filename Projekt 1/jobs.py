@@ -0,0 +1,98 @@
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from aggregation import process_file, KLUCZE
+
+
+# <kod parametru IMGW>_<YYYY>_<MM>.csv, np. B00300S_2022_07.csv
+FILE_RE = re.compile(r"^(?P<kod>B\d{5}[A-Z])_(?P<rok>\d{4})_(?P<miesiac>\d{2})\.csv$")
+
+
+def discover(root, parametry):
+    """
+    Wszystkie pliki <kod>_<YYYY>_<MM>.csv pod root (rekurencyjnie) dla
+    parametrów z PARAMETRY. Największe pliki najpierw – lepsze
+    wyrównanie obciążenia puli.
+    """
+    nazwy = {kod: nazwa for nazwa, kod in parametry.items()}
+    jobs = []
+
+    for dirpath, _, files in os.walk(root):
+        for name in files:
+            m = FILE_RE.match(name)
+            if not m or m["kod"] not in nazwy:
+                continue
+            path = os.path.join(dirpath, name)
+            jobs.append({
+                "path": path,
+                "parametr": nazwy[m["kod"]],
+                "okres": f"{m['rok']}-{m['miesiac']}",
+                "rozmiar": os.path.getsize(path)
+            })
+
+    return sorted(jobs, key=lambda j: -j["rozmiar"])
+
+
+def merge_stats(df, keys):
+    """
+    Łączy statystyki częściowe o tych samych kluczach: średnia ważona
+    liczbą odczytów (nie średnia ze średnich), min z min, max z max.
+    """
+    df = df.assign(_suma=df["srednia"] * df["liczba"])
+    g = df.groupby(keys, sort=True)
+
+    out = pd.DataFrame({
+        "srednia": g["_suma"].sum() / g["liczba"].sum(),
+        "min": g["min"].min(),
+        "max": g["max"].max(),
+        "liczba": g["liczba"].sum()
+    }).reset_index()
+
+    return out
+
+
+_lookup = None
+
+def _init_worker(lookup):
+    global _lookup
+    _lookup = lookup
+
+def _run_job(job):
+    print(f"▶ Przetwarzanie: {job['parametr']} {job['okres']}")
+    grp = process_file(job["path"], job["parametr"], _lookup, job["chunksize"])
+    grp["okres"] = job["okres"]
+    return grp
+
+
+def run_jobs(root, parametry, lookup, workers=None, chunksize=None):
+    """
+    Przetwarza wszystkie znalezione pliki w puli procesów (jeden plik = jedno
+    zadanie) i scala wyniki per (parametr, okres).
+    """
+    jobs = discover(root, parametry)
+    if not jobs:
+        return pd.DataFrame()
+
+    for job in jobs:
+        job["chunksize"] = chunksize
+
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    print(f"▶ {len(jobs)} plików, {workers} proc.")
+
+    t0 = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(lookup,)) as pool:
+            parts = list(pool.map(_run_job, jobs))
+    else:
+        _init_worker(lookup)
+        parts = [_run_job(job) for job in jobs]
+
+    # ten sam parametr i miesiąc może przyjść w kilku plikach (np. z różnych katalogów)
+    wyniki = merge_stats(pd.concat(parts, ignore_index=True), ["parametr", "okres"] + KLUCZE)
+    print(f"▶ Pliki przetworzone w {time.perf_counter() - t0:.2f} s")
+
+    return wyniki[KLUCZE + ["srednia", "min", "max", "liczba", "parametr", "okres"]]
@@ -1,121 +1,70 @@
-import pandas as pd
-import geopandas as gpd
+import os
+
 from pymongo import MongoClient
 
-DATA_DIR = r"Meteo_2022-07"
+from aggregation import CHUNK_ROWS
+from cache import refresh, aggregate_cached
+from jobs import run_jobs
+from mongo_write import swap_in, upsert
+from stacje import build_lookup
+
+# katalog przeszukiwany rekurencyjnie w poszukiwaniu <kod>_<YYYY>_<MM>.csv
+# (np. Meteo_2022-07/B00300S_2022_07.csv)
+DATA_ROOT = r"."
 STATIONS_FILE = r"kody_stacji.csv"
 
-WOJ_SHP = r"Dane administracyjne\Dane\woj.shp"
-POW_SHP = r"Dane administracyjne\Dane\powiaty.shp"
+WOJ_SHP = os.path.join("Dane administracyjne", "Dane", "woj.shp")
+POW_SHP = os.path.join("Dane administracyjne", "Dane", "powiaty.shp")
 
 OUT_CSV = r"\meteo_statystyki_full.csv"
 
+# True – pliki czytane paczkami po CHUNK_ROWS wierszy (stała pamięć),
+# False – każdy plik wczytywany w całości
+STREAMING = False
+# procesy przetwarzające pliki (None = liczba rdzeni)
+WORKERS = None
+# True – odczyty trzymane w cache Parquet (meteo_cache/), parsowane są tylko
+# nowe lub zmienione pliki, agregacja idzie z cache
+CACHE = True
+# True – wyniki zapisywane do kolekcji pomocniczej i podmieniane w całości,
+# False – upsert do meteo_stats (pozostałe okresy zostają)
+SWAP = True
+
 PARAMETRY = {
     "temperatura": "B00300S",
     "wiatr": "B00702A",
     "opad": "B00606S"
 }
 
-mongo = MongoClient("mongodb://localhost:27017/")
-db = mongo["pag_projekt"]
-collection = db["meteo_stats"]
-
-def pora_doby_z_godziny(dt):
-    return "dzień" if 6 <= dt.hour < 18 else "noc"
-
-print("▶ Wczytywanie stacji")
-stacje = pd.read_csv(STATIONS_FILE, sep=";")
-stacje["ID"] = stacje["ID"].astype(str)
-
-def dms_to_float(dms):
-    d, m, s = map(float, dms.split())
-    return d + m / 60 + s / 3600
-
-stacje["lat"] = stacje["Szerokość geograficzna"].apply(dms_to_float)
-stacje["lon"] = stacje["Długość geograficzna"].apply(dms_to_float)
-
-gdf_stacje = gpd.GeoDataFrame(
-    stacje,
-    geometry=gpd.points_from_xy(stacje["lon"], stacje["lat"]),
-    crs="EPSG:4326"
-)
-
-print("▶ Wczytywanie województw i powiatów")
-woj = gpd.read_file(WOJ_SHP).to_crs("EPSG:4326")
-powiaty = gpd.read_file(POW_SHP).to_crs("EPSG:4326")
-
-gdf_stacje = gpd.sjoin(
-    gdf_stacje,
-    woj[["name", "geometry"]],
-    how="left",
-    predicate="within"
-).rename(columns={"name": "wojewodztwo"}).drop(columns=["index_right"])
-
-gdf_stacje = gpd.sjoin(
-    gdf_stacje,
-    powiaty[["name", "geometry"]],
-    how="left",
-    predicate="within"
-).rename(columns={"name": "powiat"}).drop(columns=["index_right"])
-
-wyniki = []
-
-for nazwa, kod in PARAMETRY.items():
-    print(f"▶ Przetwarzanie: {nazwa}")
-
-    path = f"{DATA_DIR}\\{kod}_2022_07.csv"
-    if not pd.io.common.file_exists(path):
-        print(f"Brak pliku: {path}")
-        continue
-
-    df = pd.read_csv(
-        path,
-        sep=";",
-        header=None,
-        usecols=[0, 1, 2, 3],
-        names=["kod_stacji", "param", "data", "wartosc"],
-        decimal=",",
-        dtype={"kod_stacji": str},
-        low_memory=False
-    )
-
-    df["data"] = pd.to_datetime(df["data"], errors="coerce")
-    df["wartosc"] = pd.to_numeric(df["wartosc"], errors="coerce")
-    df = df.dropna()
-
-    if nazwa == "wiatr":
-        df = df[df["wartosc"] < 100]
-
-    print(f"   {nazwa}: min={df['wartosc'].min()} max={df['wartosc'].max()}")
-
-    df = df.merge(
-        gdf_stacje[["ID", "wojewodztwo", "powiat"]],
-        left_on="kod_stacji",
-        right_on="ID",
-        how="left"
-    ).dropna(subset=["wojewodztwo", "powiat"])
-
-    df["pora_doby"] = df["data"].apply(pora_doby_z_godziny)
-
-    grp = df.groupby(
-        ["wojewodztwo", "powiat", "pora_doby"]
-    )["wartosc"].agg(
-        srednia="mean",
-        min="min",
-        max="max",
-        liczba="count"
-    ).reset_index()
-
-    grp["parametr"] = nazwa
-    wyniki.append(grp)
-
-if not wyniki:
-    raise RuntimeError("Brak danych wynikowych")
-
-final_df = pd.concat(wyniki, ignore_index=True)
-final_df.to_csv(OUT_CSV, index=False)
-
-collection.delete_many({})
-collection.insert_many(final_df.to_dict("records"))
-
-print("Gotowe: CSV + MongoDB (temperatura + wiatr + opad)")
+
+def main():
+    mongo = MongoClient("mongodb://localhost:27017/")
+    db = mongo["pag_projekt"]
+    collection = db["meteo_stats"]
+
+    print("▶ Wczytywanie stacji")
+    # stacja -> (wojewodztwo, powiat) z meteo_cache/, liczona od nowa tylko po zmianie wejść
+    lookup = build_lookup(STATIONS_FILE, WOJ_SHP, POW_SHP)
+
+    chunksize = CHUNK_ROWS if STREAMING else None
+    if CACHE:
+        refresh(DATA_ROOT, PARAMETRY, lookup, workers=WORKERS, chunksize=chunksize)
+        final_df = aggregate_cached()
+    else:
+        final_df = run_jobs(DATA_ROOT, PARAMETRY, lookup, WORKERS, chunksize)
+
+    if final_df.empty:
+        raise RuntimeError("Brak danych wynikowych")
+
+    final_df.to_csv(OUT_CSV, index=False)
+
+    if SWAP:
+        swap_in(db, "meteo_stats", final_df)
+    else:
+        upsert(collection, final_df)
+
+    print("Gotowe: CSV + MongoDB (temperatura + wiatr + opad)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import time
+
+from pymongo import ASCENDING, ReplaceOne
+
+
+# jeden dokument na (region, pora doby, parametr, okres)
+KLUCZ = ["wojewodztwo", "powiat", "pora_doby", "parametr", "okres"]
+
+# dokumentów w jednym bulk_write
+BATCH = 5000
+
+
+def ensure_indexes(collection):
+    # unikalny – upsert po kluczu nie może zdublować dokumentu;
+    # prefiks (wojewodztwo, powiat) obsługuje też filtry z gui.py
+    collection.create_index([(k, ASCENDING) for k in KLUCZ], unique=True, name="klucz")
+
+
+def _batches(df, size):
+    # słowniki tylko dla bieżącej paczki, nie dla całego DataFrame
+    for start in range(0, len(df), size):
+        yield df.iloc[start:start + size].to_dict("records")
+
+
+def upsert(collection, df, batch=BATCH, ordered=False):
+    """
+    Zapisuje wyniki jako upserty po KLUCZ, paczkami po batch dokumentów.
+    Dokumenty spoza df zostają – kolekcja nigdy nie jest pusta, a ponowny
+    zapis tych samych okresów niczego nie dubluje.
+    """
+    ensure_indexes(collection)
+
+    n_up, n_mod = 0, 0
+    for docs in _batches(df, batch):
+        ops = [
+            ReplaceOne({k: doc[k] for k in KLUCZ}, doc, upsert=True)
+            for doc in docs
+        ]
+        res = collection.bulk_write(ops, ordered=ordered)
+        n_up += res.upserted_count
+        n_mod += res.modified_count
+
+    return n_up, n_mod
+
+
+def swap_in(db, name, df, batch=BATCH):
+    """
+    Pełna podmiana kolekcji: wyniki trafiają do <name>_staging, a gotowa
+    kolekcja zastępuje name jednym renameCollection. Czytelnicy widzą
+    stary albo nowy komplet danych, nigdy w połowie załadowany.
+    """
+    staging = db[f"{name}_staging"]
+    staging.drop()
+
+    t0 = time.perf_counter()
+    upsert(staging, df, batch)
+    staging.rename(name, dropTarget=True)
+    print(f"▶ MongoDB: {len(df)} dokumentów podmienionych w {time.perf_counter() - t0:.2f} s")
@@ -0,0 +1,111 @@
+import glob
+import hashlib
+import os
+
+import pandas as pd
+import geopandas as gpd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from cache import file_hash
+
+
+# tabela stacji zapisana między przebiegami; klucz wejść w metadanych pliku
+LOOKUP_FILE = os.path.join("meteo_cache", "_stacje.parquet")
+
+
+def dms_to_float(dms):
+    # "49 59 32" -> 49.9922; cała kolumna naraz, bez apply
+    d = dms.str.split(expand=True).astype(float)
+    return d[0] + d[1] / 60 + d[2] / 3600
+
+
+def _categorical(values):
+    # kategorie posortowane – groupby daje tę samą kolejność co na tekście
+    return pd.Categorical(values, categories=sorted(values.dropna().unique()))
+
+
+def inputs_key(stations_file, woj_shp, pow_shp):
+    """
+    Skrót wszystkich plików wejściowych tabeli stacji – łącznie z plikami
+    towarzyszącymi shapefile (.dbf, .shx, .prj, ...).
+    """
+    h = hashlib.sha1()
+    paths = [stations_file]
+    for shp in (woj_shp, pow_shp):
+        paths += sorted(glob.glob(glob.escape(os.path.splitext(shp)[0]) + ".*"))
+
+    for path in paths:
+        h.update(os.path.basename(path).encode())
+        h.update(file_hash(path).encode())
+    return h.hexdigest()
+
+
+def build_lookup(stations_file, woj_shp, pow_shp, cache_file=LOOKUP_FILE):
+    """
+    Tabela kod stacji -> (wojewodztwo, powiat). Zapisana w cache_file
+    i liczona od nowa tylko, gdy zmieni się któryś z plików wejściowych.
+    """
+    key = inputs_key(stations_file, woj_shp, pow_shp)
+
+    if os.path.exists(cache_file):
+        meta = pq.read_schema(cache_file).metadata or {}
+        if meta.get(b"klucz") == key.encode():
+            return pq.read_table(cache_file).to_pandas()
+
+    lookup = compute_lookup(stations_file, woj_shp, pow_shp)
+
+    table = pa.Table.from_pandas(lookup)
+    table = table.replace_schema_metadata({**table.schema.metadata, b"klucz": key.encode()})
+    os.makedirs(os.path.dirname(cache_file) or ".", exist_ok=True)
+    tmp = cache_file + ".tmp"
+    pq.write_table(table, tmp)
+    os.replace(tmp, cache_file)
+
+    return lookup
+
+
+def compute_lookup(stations_file, woj_shp, pow_shp):
+    """
+    Jedno sjoin stacji z powiatami; województwo brane z powiatu
+    (id_upper_l -> id województwa), bez geometrii województw. Punkty są
+    przeliczane do układu powiatów, a nie odwrotnie. Stacje spoza
+    powiatów są pomijane.
+    """
+    stacje = pd.read_csv(stations_file, sep=";")
+    stacje["ID"] = stacje["ID"].astype(str)
+
+    lat = dms_to_float(stacje["Szerokość geograficzna"])
+    lon = dms_to_float(stacje["Długość geograficzna"])
+
+    print("▶ Wczytywanie województw i powiatów")
+    powiaty = gpd.read_file(pow_shp, columns=["name", "id_upper_l"])
+    woj = gpd.read_file(woj_shp, columns=["id", "name"], ignore_geometry=True)
+
+    gdf_stacje = gpd.GeoDataFrame(
+        stacje[["ID"]],
+        geometry=gpd.points_from_xy(lon, lat),
+        crs="EPSG:4326"
+    ).to_crs(powiaty.crs)
+
+    gdf_stacje = gpd.sjoin(
+        gdf_stacje,
+        powiaty[["name", "id_upper_l", "geometry"]],
+        how="left",
+        predicate="within"
+    ).rename(columns={"name": "powiat"})
+
+    gdf_stacje["wojewodztwo"] = gdf_stacje["id_upper_l"].map(woj.set_index("id")["name"])
+
+    return make_lookup(gdf_stacje)
+
+
+def make_lookup(df):
+    df = df.dropna(subset=["wojewodztwo", "powiat"]).drop_duplicates("ID")
+    return pd.DataFrame(
+        {
+            "wojewodztwo": _categorical(df["wojewodztwo"]),
+            "powiat": _categorical(df["powiat"])
+        },
+        index=pd.Index(df["ID"].astype(str), name="ID")
+    )
@@ -0,0 +1,241 @@
+import heapq
+import math
+import os
+import random
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+import routing
+from routing import GRAPH_DIR, wgs84_to_1992, find_nearest_node, find_nearest_nodes
+
+# wgs84_to_1992 / find_nearest_node(s) re-eksportowane – gui.py importuje
+# z backendu komplet funkcji o tych samych nazwach co routing.py i neo.py
+__all__ = [
+    "Landmarks",
+    "build",
+    "build_and_save",
+    "get_landmarks",
+    "landmarks_path",
+    "dijkstra_length",
+    "astar_time",
+    "shortest_route",
+    "fastest_route",
+    "wgs84_to_1992",
+    "find_nearest_node",
+    "find_nearest_nodes",
+]
+
+
+N_LANDMARKS = 16
+SEED = 0
+# odległość do/od węzła nieosiągalnego – duża liczba zamiast inf, żeby
+# różnice w heurystyce nie dawały nan (ograniczenie dalej poprawne)
+UNREACHABLE = 1e15
+
+
+def _sssp(indptr, indices, weights, source, n):
+    dist = [math.inf] * n
+    dist[source] = 0.0
+    heap = [(0.0, source)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return np.array(dist)
+
+
+def _reverse(graph, weights):
+    # CSR łuków odwróconych: odległości do landmarka zamiast od niego
+    order = np.argsort(graph.indices, kind="stable")
+    indptr = np.zeros(graph.n_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.indices, minlength=graph.n_nodes), out=indptr[1:])
+    return indptr.tolist(), graph.arc_source[order].tolist(), weights[order].tolist()
+
+
+def build(graph, metric, n_landmarks=N_LANDMARKS, seed=SEED):
+    """
+    Landmarki wybierane zachłannie „najdalszy od dotychczasowych”
+    (start z losowego węzła), dla każdego pełny Dijkstra w przód
+    i wstecz. Tablice (landmark, węzeł) trzymają d(L, v) i d(v, L).
+    """
+    n = graph.n_nodes
+    weights = graph.arc_weights(metric)
+    fwd_adj = (graph.indptr.tolist(), graph.indices.tolist(), weights.tolist())
+    bwd_adj = _reverse(graph, weights)
+
+    # odległość od najbliższego wybranego landmarka, nieosiągalne pomijamy
+    nearest = _sssp(*fwd_adj, random.Random(seed).randrange(n), n)
+    landmarks, fwd, bwd = [], [], []
+
+    for _ in range(min(n_landmarks, n)):
+        cand = np.where(np.isfinite(nearest), nearest, -1.0)
+        if landmarks:
+            cand[landmarks] = -1.0
+        lm = int(np.argmax(cand))
+        if cand[lm] < 0:
+            break
+
+        d_from = _sssp(*fwd_adj, lm, n)
+        d_to = _sssp(*bwd_adj, lm, n)
+        landmarks.append(lm)
+        fwd.append(d_from)
+        bwd.append(d_to)
+        nearest = np.minimum(nearest, d_from)
+
+    return Landmarks(
+        np.array(landmarks, dtype=np.int64),
+        np.minimum(np.vstack(fwd), UNREACHABLE),
+        np.minimum(np.vstack(bwd), UNREACHABLE),
+        metric
+    )
+
+
+class Landmarks:
+    """
+    Heurystyka ALT: z nierówności trójkąta d(v, t) >= d(L, t) - d(L, v)
+    oraz d(v, t) >= d(v, L) - d(t, L); bierzemy maksimum po landmarkach.
+    Ograniczenie jest spójne, więc A* w RoadGraph działa bez zmian.
+    """
+
+    FIELDS = ("landmarks", "dist_from", "dist_to")
+
+    def __init__(self, landmarks, dist_from, dist_to, metric):
+        self.landmarks = landmarks
+        self.dist_from = dist_from
+        self.dist_to = dist_to
+        self.metric = metric
+
+        # układ węzeł -> krotka po landmarkach, szybszy w pętli kopca
+        self._from = [tuple(r) for r in dist_from.T.tolist()]
+        self._to = [tuple(r) for r in dist_to.T.tolist()]
+
+    def save(self, path, version):
+        routing.savez_atomic(
+            path, version=np.array(version), metric=np.array(self.metric),
+            landmarks=self.landmarks, dist_from=self.dist_from, dist_to=self.dist_to
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            h = cls(*(z[f] for f in cls.FIELDS), str(z["metric"]))
+            return h, str(z["version"])
+
+    def heuristic(self, t):
+        from_t = self._from[t]
+        to_t = self._to[t]
+        dist_from, dist_to = self._from, self._to
+
+        def h(v):
+            best = 0.0
+            for a, b, c, d in zip(from_t, dist_from[v], dist_to[v], to_t):
+                if a - b > best:
+                    best = a - b
+                if c - d > best:
+                    best = c - d
+            return best
+
+        return h
+
+    def search(self, graph, s, t):
+        h = self.heuristic(t)
+        # ograniczenie rzędu UNREACHABLE: t nieosiągalny z s, bez przeszukiwania
+        if h(s) >= UNREACHABLE / 2:
+            graph.last_settled = 0
+            return [], [], None
+        return graph._search(s, t, self.metric, h)
+
+    def route(self, graph, s, t):
+        path, arcs, cost = self.search(graph, s, t)
+        return graph.route(path, arcs, cost) if path else None
+
+
+def landmarks_path(metric, graph_dir=GRAPH_DIR):
+    return os.path.join(graph_dir, f"alt_{metric}.npz")
+
+
+def build_and_save(graph_dir=GRAPH_DIR):
+    graph = routing.load_graph(graph_dir)
+    version = routing.graph_version(graph_dir)
+
+    for metric in ("length", "time"):
+        t0 = time.perf_counter()
+        lm = build(graph, metric)
+        lm.save(landmarks_path(metric, graph_dir), version)
+        print(
+            f"▶ ALT ({metric}): {len(lm.landmarks)} landmarków, "
+            f"{time.perf_counter() - t0:.1f} s"
+        )
+
+
+_landmarks = {}
+# jedna budowa na metrykę naraz – drugie kliknięcie czeka na wynik pierwszego
+_build_locks = {"length": threading.Lock(), "time": threading.Lock()}
+
+def _load_stored(path, version):
+    # plik nieczytelny (np. urwany zapis sprzed poprawki) = nieaktualny
+    if not os.path.exists(path):
+        return None
+    try:
+        lm, stored = Landmarks.load(path)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    return lm if stored == version else None
+
+def get_landmarks(metric):
+    # tablice z innej wersji grafu są nieaktualne – liczymy je od nowa
+    version = routing.graph_version()
+    cached = _landmarks.get(metric)
+    if cached is not None and cached[1] == version:
+        return cached[0]
+
+    with _build_locks[metric]:
+        cached = _landmarks.get(metric)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+
+        path = landmarks_path(metric)
+        lm = _load_stored(path, version)
+
+        if lm is None:
+            lm = build(routing.get_graph(), metric)
+            lm.save(path, version)
+
+        _landmarks[metric] = (lm, version)
+        return lm
+
+
+# Te same sygnatury co w routing.py / neo.py
+
+def dijkstra_length(s, t):
+    g = routing.get_graph()
+    path, _, cost = get_landmarks("length").search(g, g.index[s], g.index[t])
+    return g.to_ids(path), cost
+
+def astar_time(s, t):
+    g = routing.get_graph()
+    path, _, cost = get_landmarks("time").search(g, g.index[s], g.index[t])
+    return g.to_ids(path), cost
+
+def shortest_route(s, t):
+    g = routing.get_graph()
+    return get_landmarks("length").route(g, g.index[s], g.index[t])
+
+def fastest_route(s, t):
+    g = routing.get_graph()
+    return get_landmarks("time").route(g, g.index[s], g.index[t])
+
+
+if __name__ == "__main__":
+    build_and_save()
@@ -0,0 +1,202 @@
+import csv
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+import numpy as np
+
+import routing
+from routing import GRAPH_DIR
+
+
+N_PAIRS = 200
+SEED = 42
+# pierwsze wywołanie każdego backendu (ładowanie grafu, hierarchii, połączenie)
+# nie wchodzi do pomiaru
+WARMUP = 5
+# zgodność kosztów między backendami
+REL_TOL = 1e-6
+
+OUT_DIR = os.path.join(GRAPH_DIR, "benchmark")
+
+
+def sample_pairs(n=N_PAIRS, seed=SEED, graph_dir=GRAPH_DIR):
+    # te same pary dla tego samego seeda i vertices.csv
+    with open(os.path.join(graph_dir, "vertices.csv"), encoding="utf-8") as f:
+        vids = [int(r["vertex_id"]) for r in csv.DictReader(f)]
+
+    rng = random.Random(seed)
+    pairs = []
+    while len(pairs) < n:
+        s, t = rng.choice(vids), rng.choice(vids)
+        if s != t:
+            pairs.append((s, t))
+    return pairs
+
+
+def _local(metric):
+    g = routing.get_graph()
+    search = g.dijkstra if metric == "length" else g.astar
+
+    def call(s, t):
+        _, _, cost = search(g.index[s], g.index[t], metric)
+        return cost, g.last_settled
+    return call
+
+def _ch(metric):
+    import ch
+    g = routing.get_graph()
+    h = ch.get_hierarchy(metric)
+
+    def call(s, t):
+        _, cost = h.query(g.index[s], g.index[t])
+        return cost, h.last_settled
+    return call
+
+def _alt(metric):
+    import alt
+    g = routing.get_graph()
+    lm = alt.get_landmarks(metric)
+
+    def call(s, t):
+        _, _, cost = lm.search(g, g.index[s], g.index[t])
+        return cost, g.last_settled
+    return call
+
+def _gds(metric):
+    import neo
+    search = neo.dijkstra_length if metric == "length" else neo.astar_time
+    ids = {}
+
+    def call(s, t):
+        missing = [v for v in (s, t) if v not in ids]
+        if missing:
+            ids.update(zip(missing, neo.node_ids(missing)))
+        _, cost = search(ids[s], ids[t])
+        return cost, None
+    return call
+
+
+# nazwa -> (metryka, fabryka funkcji (s, t) -> (koszt, rozliczone węzły))
+BACKENDS = {
+    "local_dijkstra": ("length", lambda: _local("length")),
+    "local_astar": ("time", lambda: _local("time")),
+    "ch_length": ("length", lambda: _ch("length")),
+    "ch_time": ("time", lambda: _ch("time")),
+    "alt_length": ("length", lambda: _alt("length")),
+    "alt_time": ("time", lambda: _alt("time")),
+    "gds_dijkstra": ("length", lambda: _gds("length")),
+    "gds_astar": ("time", lambda: _gds("time"))
+}
+
+
+def run_backend(name, pairs):
+    metric, factory = BACKENDS[name]
+    try:
+        call = factory()
+        for s, t in pairs[:WARMUP]:
+            call(s, t)
+    except Exception as e:
+        print(f"   {name}: pominięty ({type(e).__name__}: {e})")
+        return None
+
+    costs, settled, lat = [], [], []
+    t_start = time.perf_counter()
+    for s, t in pairs:
+        t0 = time.perf_counter()
+        cost, n = call(s, t)
+        lat.append(time.perf_counter() - t0)
+        costs.append(cost)
+        settled.append(n)
+    total = time.perf_counter() - t_start
+
+    lat_ms = np.array(lat) * 1000
+    counted = [n for n in settled if n is not None]
+
+    return {
+        "metric": metric,
+        "pairs": len(pairs),
+        "unreachable": sum(c is None for c in costs),
+        "p50_ms": float(np.percentile(lat_ms, 50)),
+        "p95_ms": float(np.percentile(lat_ms, 95)),
+        "p99_ms": float(np.percentile(lat_ms, 99)),
+        "mean_ms": float(lat_ms.mean()),
+        "throughput_qps": len(pairs) / max(total, 1e-9),
+        "settled_mean": float(np.mean(counted)) if counted else None,
+        "settled_p50": float(np.percentile(counted, 50)) if counted else None,
+        "costs": costs
+    }
+
+
+def agreement(results):
+    """
+    Koszty każdego backendu względem pierwszego dostępnego z tą samą
+    metryką: liczba niezgodnych par i największa różnica względna.
+    """
+    out = {}
+    for metric in ("length", "time"):
+        names = [n for n, r in results.items() if r["metric"] == metric]
+        if not names:
+            continue
+
+        ref = results[names[0]]["costs"]
+        for name in names[1:]:
+            diffs, mismatched = [], 0
+            for a, b in zip(ref, results[name]["costs"]):
+                if a is None or b is None:
+                    mismatched += (a is None) != (b is None)
+                    continue
+                d = abs(a - b) / max(abs(a), 1e-9)
+                diffs.append(d)
+                mismatched += d > REL_TOL
+
+            out[f"{name}_vs_{names[0]}"] = {
+                "mismatched": mismatched,
+                "max_rel_diff": max(diffs, default=0.0)
+            }
+    return out
+
+
+def run_benchmark(backends=None, n=N_PAIRS, seed=SEED, out_dir=OUT_DIR):
+    pairs = sample_pairs(n, seed)
+    print(f"▶ Benchmark: {len(pairs)} par (seed {seed}), graf {routing.graph_version()}")
+
+    results = {}
+    for name in backends or BACKENDS:
+        r = run_backend(name, pairs)
+        if r is None:
+            continue
+        results[name] = r
+        settled = f"{r['settled_mean']:.0f}" if r["settled_mean"] is not None else "-"
+        print(
+            f"   {name:15s} p50 {r['p50_ms']:8.2f} ms  p95 {r['p95_ms']:8.2f} ms  "
+            f"p99 {r['p99_ms']:8.2f} ms  {r['throughput_qps']:8.1f} zap/s  "
+            f"rozliczone {settled}"
+        )
+
+    agree = agreement(results)
+    for key, a in agree.items():
+        print(f"   {key}: {a['mismatched']} niezgodnych, max różnica {a['max_rel_diff']:.2e}")
+
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "graph_version": routing.graph_version(),
+        "seed": seed,
+        "pairs": pairs,
+        "backends": results,
+        "agreement": agree
+    }
+
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"▶ Wyniki: {path}")
+
+    return report
+
+
+if __name__ == "__main__":
+    run_benchmark()
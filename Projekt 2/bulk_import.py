@@ -0,0 +1,179 @@
+import csv
+import os
+
+from neo4j import GraphDatabase
+
+from instrument import stage
+
+
+NEO4J_URI = "bolt://127.0.0.1:7687"
+NEO4J_AUTH = ("neo4j", "adminadmin")
+
+GRAPH_DIR = r"wyniki"
+BATCH_SIZE = 5000
+
+
+CONSTRAINT_QUERY = """
+CREATE CONSTRAINT node_id IF NOT EXISTS
+FOR (n:Node) REQUIRE n.id IS UNIQUE
+"""
+
+EDGE_INDEX_QUERY = """
+CREATE INDEX road_edge_id IF NOT EXISTS
+FOR ()-[r:ROAD]-() ON (r.edge_id)
+"""
+
+NODES_QUERY = """
+UNWIND $rows AS r
+CREATE (:Node {
+    id: r.id,
+    x: r.x,
+    y: r.y,
+    x_astar: r.xa,
+    y_astar: r.ya
+})
+"""
+
+EDGES_QUERY = """
+UNWIND $rows AS r
+MATCH (a:Node {id: r.from})
+MATCH (b:Node {id: r.to})
+CREATE (a)-[:ROAD {
+    edge_id: r.id,
+    length: r.length,
+    time: r.time,
+    class: r.cls,
+    oneway: r.oneway
+}]->(b)
+"""
+
+# Jedna relacja ROAD na odcinek; kierunki dozwolone przez oneway rozwija
+# dopiero projekcja GDS (agregacja Cypher zamiast orientation:'UNDIRECTED')
+PROJECT_QUERY = """
+MATCH (a:Node)-[r:ROAD]->(b:Node)
+UNWIND CASE coalesce(r.oneway, 0)
+    WHEN 1 THEN [[a, b]]
+    WHEN -1 THEN [[b, a]]
+    ELSE [[a, b], [b, a]]
+END AS pair
+WITH r, pair[0] AS s, pair[1] AS t
+WITH gds.graph.project(
+    $name, s, t,
+    {
+        sourceNodeProperties: s { .x_astar, .y_astar },
+        targetNodeProperties: t { .x_astar, .y_astar },
+        relationshipProperties: r { .length, .time }
+    }
+) AS g
+RETURN g.graphName AS name, g.relationshipCount AS relationships
+"""
+
+
+def read_vertices(path):
+    with open(path, encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            yield {
+                "id": int(r["vertex_id"]),
+                "x": float(r["x"]),
+                "y": float(r["y"]),
+                "xa": float(r["x_astar"]),
+                "ya": float(r["y_astar"])
+            }
+
+
+def read_edges(path):
+    with open(path, encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            yield {
+                "id": int(r["edge_id"]),
+                "from": int(r["from_vertex"]),
+                "to": int(r["to_vertex"]),
+                "length": float(r["length_m"]),
+                "time": float(r["time_s"]),
+                "cls": r["klasaDrogi"],
+                "oneway": int(r.get("oneway") or 0)
+            }
+
+
+def batches(rows, size):
+    batch = []
+    for r in rows:
+        batch.append(r)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _write_batch(tx, query, rows):
+    tx.run(query, rows=rows).consume()
+
+
+def import_rows(driver, query, rows, batch_size=BATCH_SIZE, label=""):
+    # jedna partia = jedna transakcja = jedno zapytanie do bazy
+    with stage(f"neo4j: {label}") as rec:
+        with driver.session() as session:
+            for batch in batches(rows, batch_size):
+                session.execute_write(_write_batch, query, batch)
+                rec["rows"] += len(batch)
+                rec["round_trips"] += 1
+
+    return rec["rows"], rec["time_s"]
+
+
+def bulk_load(driver, vertices_csv, edges_csv, batch_size=BATCH_SIZE):
+    with stage("neo4j: czyszczenie i indeksy") as rec, driver.session() as session:
+        session.run("MATCH (n) DETACH DELETE n").consume()
+        # ograniczenie przed wstawianiem, żeby MATCH krawędzi szedł po indeksie
+        session.run(CONSTRAINT_QUERY).consume()
+        session.run(EDGE_INDEX_QUERY).consume()
+        rec["round_trips"] = 3
+
+    print(f"▶ Import do Neo4j (partie po {batch_size})")
+    import_rows(driver, NODES_QUERY, read_vertices(vertices_csv), batch_size, "węzły")
+    import_rows(driver, EDGES_QUERY, read_edges(edges_csv), batch_size, "odcinki")
+
+
+def write_admin_import(vertices_csv, edges_csv, out_dir):
+    """
+    Paczka dla `neo4j-admin database import full` (ładowanie na zimno,
+    baza musi być zatrzymana). Ograniczenie i projekcje GDS trzeba
+    utworzyć po starcie bazy.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+
+    nodes_csv = os.path.join(out_dir, "nodes.csv")
+    roads_csv = os.path.join(out_dir, "roads.csv")
+
+    with open(nodes_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["id:ID", "x:double", "y:double", "x_astar:double", "y_astar:double"])
+        for r in read_vertices(vertices_csv):
+            w.writerow([r["id"], r["x"], r["y"], r["xa"], r["ya"]])
+
+    with open(roads_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow([":START_ID", ":END_ID", "edge_id:long", "length:double", "time:double", "class", "oneway:int"])
+        for r in read_edges(edges_csv):
+            w.writerow([r["from"], r["to"], r["id"], r["length"], r["time"], r["cls"], r["oneway"]])
+
+    cmd = (
+        "neo4j-admin database import full neo4j --overwrite-destination "
+        "--id-type=integer --nodes=Node=nodes.csv --relationships=ROAD=roads.csv"
+    )
+    for name in ("import.sh", "import.bat"):
+        with open(os.path.join(out_dir, name), "w", encoding="utf-8") as f:
+            f.write(cmd + "\n")
+
+    print(f"▶ Paczka neo4j-admin import: {out_dir}")
+
+
+if __name__ == "__main__":
+    driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
+    bulk_load(
+        driver,
+        os.path.join(GRAPH_DIR, "vertices.csv"),
+        os.path.join(GRAPH_DIR, "edges.csv")
+    )
+    driver.close()
@@ -0,0 +1,365 @@
+import heapq
+import math
+import os
+import threading
+import time
+import zipfile
+
+import numpy as np
+
+import routing
+from routing import GRAPH_DIR, wgs84_to_1992, find_nearest_node, find_nearest_nodes
+
+# wgs84_to_1992 / find_nearest_node(s) re-eksportowane – gui.py importuje
+# z backendu komplet funkcji o tych samych nazwach co routing.py i neo.py
+__all__ = [
+    "Hierarchy",
+    "build",
+    "build_and_save",
+    "get_hierarchy",
+    "hierarchy_path",
+    "dijkstra_length",
+    "astar_time",
+    "shortest_route",
+    "fastest_route",
+    "wgs84_to_1992",
+    "find_nearest_node",
+    "find_nearest_nodes",
+]
+
+
+# limit węzłów rozliczonych w wyszukiwaniu świadków – po przekroczeniu
+# skrót jest dodawany „na zapas” (poprawność zachowana, graf trochę większy)
+WITNESS_LIMIT = 200
+
+
+def _witness(out, source, skip, targets, max_cost):
+    dist = {source: 0.0}
+    heap = [(0.0, source)]
+    left = set(targets)
+    settled = 0
+
+    while heap and left:
+        d, u = heapq.heappop(heap)
+        if d > dist.get(u, math.inf):
+            continue
+        if d > max_cost:
+            break
+
+        left.discard(u)
+        settled += 1
+        if settled > WITNESS_LIMIT:
+            break
+
+        for v, (w, _, _) in out[u].items():
+            if v == skip:
+                continue
+            nd = d + w
+            if nd < dist.get(v, math.inf):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return dist
+
+
+def _shortcuts(out, inc, v):
+    found = []
+    for u, (w_in, _, _) in inc[v].items():
+        targets = {w: w_in + w_out for w, (w_out, _, _) in out[v].items() if w != u}
+        if not targets:
+            continue
+
+        dist = _witness(out, u, v, targets, max(targets.values()))
+        for w, cost in targets.items():
+            if dist.get(w, math.inf) > cost:
+                found.append((u, w, cost))
+
+    return found
+
+
+def build(graph, metric):
+    """
+    Contraction Hierarchies dla metryki "length" albo "time".
+    Węzły są kontraktowane wg różnicy krawędzi (leniwa aktualizacja
+    priorytetów), skróty pamiętają węzeł środkowy do rozwijania ścieżki.
+    """
+    arc_w = graph.arc_weights(metric).tolist()
+    src = graph.arc_source.tolist()
+    dst = graph.indices.tolist()
+    n = graph.n_nodes
+
+    # out[u][v] = (waga, węzeł środkowy lub -1, łuk CSR lub -1)
+    out = [dict() for _ in range(n)]
+    inc = [dict() for _ in range(n)]
+    for k, (u, v, w) in enumerate(zip(src, dst, arc_w)):
+        # pętle i łuki pod prąd jednokierunkowych nie wchodzą do hierarchii
+        if u == v or w == math.inf:
+            continue
+        if v not in out[u] or w < out[u][v][0]:
+            out[u][v] = (w, -1, k)
+            inc[v][u] = (w, -1, k)
+
+    deleted = [0] * n
+
+    def priority(v, shortcuts):
+        return len(shortcuts) - len(out[v]) - len(inc[v]) + deleted[v]
+
+    heap = [(priority(v, _shortcuts(out, inc, v)), v) for v in range(n)]
+    heapq.heapify(heap)
+
+    rank = np.full(n, -1, dtype=np.int64)
+    up_out = [None] * n
+    up_in = [None] * n
+    order = 0
+
+    while heap:
+        _, v = heapq.heappop(heap)
+        if rank[v] >= 0:
+            continue
+
+        shortcuts = _shortcuts(out, inc, v)
+        p = priority(v, shortcuts)
+        if heap and p > heap[0][0]:
+            heapq.heappush(heap, (p, v))
+            continue
+
+        rank[v] = order
+        order += 1
+
+        up_out[v] = out[v]
+        up_in[v] = inc[v]
+        for w in out[v]:
+            del inc[w][v]
+            deleted[w] += 1
+        for u in inc[v]:
+            del out[u][v]
+            deleted[u] += 1
+
+        for u, w, cost in shortcuts:
+            if w not in out[u] or cost < out[u][w][0]:
+                out[u][w] = (cost, v, -1)
+                inc[w][u] = (cost, v, -1)
+
+        out[v] = {}
+        inc[v] = {}
+
+    return Hierarchy(rank, *_pack(up_out), *_pack(up_in), metric)
+
+
+def _pack(adj):
+    indptr = np.zeros(len(adj) + 1, dtype=np.int64)
+    np.cumsum([len(a) for a in adj], out=indptr[1:])
+
+    items = [(v, w, mid, arc) for a in adj for v, (w, mid, arc) in a.items()]
+    if not items:
+        items = np.empty((0, 4))
+    cols = np.asarray(items, dtype=float).reshape(-1, 4)
+
+    return (
+        indptr,
+        cols[:, 0].astype(np.int64),
+        cols[:, 1],
+        cols[:, 2].astype(np.int64),
+        cols[:, 3].astype(np.int64)
+    )
+
+
+class Hierarchy:
+    """
+    Graf w górę hierarchii w postaci dwóch CSR: fwd (u -> w, rank w > rank u)
+    i bwd (u <- w, rank w > rank u). Zapytanie to dwukierunkowy Dijkstra
+    po łukach w górę.
+    """
+
+    FIELDS = ("rank",
+              "fwd_indptr", "fwd_to", "fwd_w", "fwd_mid", "fwd_arc",
+              "bwd_indptr", "bwd_to", "bwd_w", "bwd_mid", "bwd_arc")
+
+    def __init__(self, rank,
+                 fwd_indptr, fwd_to, fwd_w, fwd_mid, fwd_arc,
+                 bwd_indptr, bwd_to, bwd_w, bwd_mid, bwd_arc, metric):
+        self.rank = rank
+        self.fwd = (fwd_indptr, fwd_to, fwd_w, fwd_mid, fwd_arc)
+        self.bwd = (bwd_indptr, bwd_to, bwd_w, bwd_mid, bwd_arc)
+        self.metric = metric
+        self.last_settled = 0
+
+        self._fwd = tuple(a.tolist() for a in self.fwd)
+        self._bwd = tuple(a.tolist() for a in self.bwd)
+
+    @property
+    def n_shortcuts(self):
+        return int((self.fwd[3] >= 0).sum() + (self.bwd[3] >= 0).sum())
+
+    def save(self, path, version):
+        arrays = dict(zip(self.FIELDS, (self.rank,) + self.fwd + self.bwd))
+        routing.savez_atomic(path, version=np.array(version), metric=np.array(self.metric), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            h = cls(*(z[f] for f in cls.FIELDS), str(z["metric"]))
+            return h, str(z["version"])
+
+    def _find(self, side, u, w):
+        indptr, to, _, mid, arc = side
+        for k in range(indptr[u], indptr[u + 1]):
+            if to[k] == w:
+                return mid[k], arc[k]
+        raise KeyError((u, w))
+
+    def _unpack(self, u, w, mid, arc, out):
+        # skrót u -> w przez mid: łuk u -> mid leży w bwd[mid], mid -> w w fwd[mid]
+        if mid < 0:
+            out.append(arc)
+            return
+        m1, a1 = self._find(self._bwd, mid, u)
+        self._unpack(u, mid, m1, a1, out)
+        m2, a2 = self._find(self._fwd, mid, w)
+        self._unpack(mid, w, m2, a2, out)
+
+    def query(self, s, t):
+        if s == t:
+            return [], 0.0
+
+        dist = ({s: 0.0}, {t: 0.0})
+        pred = ({}, {})
+        heaps = ([(0.0, s)], [(0.0, t)])
+        sides = (self._fwd, self._bwd)
+        best, meet = math.inf, -1
+        settled = 0
+
+        while heaps[0] or heaps[1]:
+            for d in (0, 1):
+                heap = heaps[d]
+                if not heap:
+                    continue
+                if heap[0][0] >= best:
+                    heap.clear()
+                    continue
+
+                du, u = heapq.heappop(heap)
+                if du > dist[d][u]:
+                    continue
+                settled += 1
+
+                other = dist[1 - d].get(u)
+                if other is not None and du + other < best:
+                    best, meet = du + other, u
+
+                indptr, to, w, _, _ = sides[d]
+                for k in range(indptr[u], indptr[u + 1]):
+                    v = to[k]
+                    nd = du + w[k]
+                    if nd < dist[d].get(v, math.inf):
+                        dist[d][v] = nd
+                        pred[d][v] = (u, k)
+                        heapq.heappush(heap, (nd, v))
+
+        self.last_settled = settled
+        if meet < 0:
+            return [], None
+
+        arcs = []
+        chain = []
+        v = meet
+        while v != s:
+            u, k = pred[0][v]
+            chain.append((u, v, k))
+            v = u
+        for u, v, k in reversed(chain):
+            self._unpack(u, v, self._fwd[3][k], self._fwd[4][k], arcs)
+
+        v = meet
+        while v != t:
+            w, k = pred[1][v]
+            self._unpack(v, w, self._bwd[3][k], self._bwd[4][k], arcs)
+            v = w
+
+        return arcs, best
+
+    def route(self, graph, s, t):
+        arcs, cost = self.query(s, t)
+        if cost is None:
+            return None
+
+        path = [s] + graph.indices[arcs].tolist()
+        return graph.route(path, arcs, cost)
+
+
+def hierarchy_path(metric, graph_dir=GRAPH_DIR):
+    return os.path.join(graph_dir, f"ch_{metric}.npz")
+
+
+def build_and_save(graph_dir=GRAPH_DIR):
+    graph = routing.load_graph(graph_dir)
+    version = routing.graph_version(graph_dir)
+
+    for metric in ("length", "time"):
+        t0 = time.perf_counter()
+        h = build(graph, metric)
+        h.save(hierarchy_path(metric, graph_dir), version)
+        print(
+            f"▶ CH ({metric}): {graph.n_nodes} węzłów, {h.n_shortcuts} skrótów, "
+            f"{time.perf_counter() - t0:.1f} s"
+        )
+
+
+_hierarchies = {}
+# jedna budowa na metrykę naraz – drugie kliknięcie czeka na wynik pierwszego
+_build_locks = {"length": threading.Lock(), "time": threading.Lock()}
+
+def _load_stored(path, version):
+    # plik nieczytelny (np. urwany zapis sprzed poprawki) = nieaktualny
+    if not os.path.exists(path):
+        return None
+    try:
+        h, stored = Hierarchy.load(path)
+    except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+        return None
+    return h if stored == version else None
+
+def get_hierarchy(metric):
+    # hierarchia z innej wersji grafu jest nieaktualna – budujemy ją od nowa
+    version = routing.graph_version()
+    cached = _hierarchies.get(metric)
+    if cached is not None and cached[1] == version:
+        return cached[0]
+
+    with _build_locks[metric]:
+        cached = _hierarchies.get(metric)
+        if cached is not None and cached[1] == version:
+            return cached[0]
+
+        path = hierarchy_path(metric)
+        h = _load_stored(path, version)
+
+        if h is None:
+            h = build(routing.get_graph(), metric)
+            h.save(path, version)
+
+        _hierarchies[metric] = (h, version)
+        return h
+
+
+# Te same sygnatury co w routing.py / neo.py
+
+def dijkstra_length(s, t):
+    r = shortest_route(s, t)
+    return (r["nodes"], r["cost"]) if r else ([], None)
+
+def astar_time(s, t):
+    r = fastest_route(s, t)
+    return (r["nodes"], r["cost"]) if r else ([], None)
+
+def shortest_route(s, t):
+    g = routing.get_graph()
+    return get_hierarchy("length").route(g, g.index[s], g.index[t])
+
+def fastest_route(s, t):
+    g = routing.get_graph()
+    return get_hierarchy("time").route(g, g.index[s], g.index[t])
+
+
+if __name__ == "__main__":
+    build_and_save()
@@ -1,27 +1,61 @@
 import sys, os, json, time
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import parse_qs
 
-from PyQt5.QtCore import QUrl, pyqtSlot
+from PyQt5.QtCore import QUrl, pyqtSignal, pyqtSlot
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QHBoxLayout, QVBoxLayout,
     QLabel, QTextEdit
 )
 from PyQt5.QtWebEngineWidgets import QWebEngineView, QWebEnginePage
 
-from neo import (
-    wgs84_to_1992,
-    find_nearest_node,
-    dijkstra_length,
-    astar_time,
-    get_coords,
-    get_path_stats
-)
+from route_cache import RouteCache
+from isochrone import isochrones, THRESHOLDS_MIN
+from routing import graph_version
+
+# "local" – graf z wyniki/*.csv w pamięci (routing.py), "neo4j" – GDS przez Bolt,
+# "ch" – Contraction Hierarchies (ch.py, hierarchie z wyniki/ch_*.npz),
+# "alt" – A* z landmarkami (alt.py, tablice z wyniki/alt_*.npz)
+BACKEND = "local"
+
+if BACKEND == "neo4j":
+    # snap z indeksu w pamięci, obie trasy w jednym zapytaniu (route_pair)
+    from neo import (
+        wgs84_to_1992,
+        snap_pair,
+        route_pair
+    )
+elif BACKEND == "ch":
+    from ch import (
+        wgs84_to_1992,
+        find_nearest_node,
+        shortest_route,
+        fastest_route
+    )
+elif BACKEND == "alt":
+    from alt import (
+        wgs84_to_1992,
+        find_nearest_node,
+        shortest_route,
+        fastest_route
+    )
+else:
+    from routing import (
+        wgs84_to_1992,
+        find_nearest_node,
+        shortest_route,
+        fastest_route
+    )
+
+
+ROUTE_CACHE = RouteCache(graph_version, maxsize=512, ttl=600)
 
 
 class MapPage(QWebEnginePage):
-    def __init__(self, parent, callback):
+    def __init__(self, parent, callback, iso_callback):
         super().__init__(parent)
         self.callback = callback
+        self.iso_callback = iso_callback
 
     def acceptNavigationRequest(self, url, *_):
         if url.scheme() == "route":
@@ -31,11 +65,22 @@ class MapPage(QWebEnginePage):
                 float(q["ey"][0]), float(q["ex"][0])
             )
             return False
+        if url.scheme() == "isochrone":
+            q = parse_qs(url.query())
+            self.iso_callback(float(q["y"][0]), float(q["x"][0]))
+            return False
         return True
 
 
 
 class App(QWidget):
+    # wyniki z wątków roboczych trafiają do wątku UI przez sygnały Qt;
+    # pending, results i request_id zmienia wyłącznie wątek UI
+    snapReady = pyqtSignal(int, object, object)
+    routeReady = pyqtSignal(int, str, object)
+    routeFailed = pyqtSignal(int, str)
+    isochroneReady = pyqtSignal(int, object, float)
+
     def __init__(self):
         super().__init__()
 
@@ -57,7 +102,7 @@ class App(QWidget):
 
 
         self.view = QWebEngineView()
-        self.page = MapPage(self.view, self.compute_route)
+        self.page = MapPage(self.view, self.compute_route, self.compute_isochrone)
         self.view.setPage(self.page)
 
         self.view.load(QUrl.fromLocalFile(
@@ -67,68 +112,213 @@ class App(QWidget):
         main.addWidget(self.view, 4)
 
 
+        self.pool = ThreadPoolExecutor(max_workers=4)
+        self.request_id = 0
+        self.pending = []
+        self.results = {}
+
+        self.snapReady.connect(self.on_snap_ready)
+        self.routeReady.connect(self.on_route_ready)
+        self.routeFailed.connect(self.on_route_failed)
+        self.isochroneReady.connect(self.on_isochrone_ready)
+
+
     @pyqtSlot(float, float, float, float)
     def compute_route(self, sy, sx, ey, ex):
-        try:
+        # nowe kliknięcie unieważnia poprzednie zapytanie
+        self.request_id += 1
+        req = self.request_id
+
+        for f in self.pending:
+            f.cancel()
+        self.pending = []
+        self.results = {}
+
+        self.view.page().runJavaScript("clearRoutes();")
+        self.info.setText("Obliczanie tras...")
 
+        self.pending.append(self.pool.submit(self._snap, req, sx, sy, ex, ey))
+
+    def _snap(self, req, sx, sy, ex, ey):
+        try:
             sx92, sy92 = wgs84_to_1992(sx, sy)
             ex92, ey92 = wgs84_to_1992(ex, ey)
 
-            s = find_nearest_node(sx92, sy92)
-            t = find_nearest_node(ex92, ey92)
+            if BACKEND == "neo4j":
+                s, t = snap_pair(sx92, sy92, ex92, ey92)
+            else:
+                s = find_nearest_node(sx92, sy92)
+                t = find_nearest_node(ex92, ey92)
 
             if s == t:
                 raise RuntimeError("Start i koniec na tym samym węźle")
+        except Exception as e:
+            self.routeFailed.emit(req, str(e))
+            return
 
+        self.snapReady.emit(req, s, t)
 
-            t0 = time.perf_counter()
-            nodes_d, _ = dijkstra_length(s, t)
-            time_d = (time.perf_counter() - t0) * 1000
+    def on_snap_ready(self, req, s, t):
+        if req != self.request_id:
+            return
 
-            if not nodes_d:
-                raise RuntimeError("Brak trasy (Dijkstra)")
+        if BACKEND == "neo4j":
+            self.pending.append(self.pool.submit(self._search_pair, req, s, t))
+            return
 
-            len_d = get_path_stats(nodes_d)
-            coords_d = get_coords(nodes_d)
+        # Dijkstra i A* są niezależne – liczone równolegle
+        self.pending += [
+            self.pool.submit(self._search, req, "dijkstra", s, t),
+            self.pool.submit(self._search, req, "astar", s, t)
+        ]
 
+    def _search(self, req, algo, s, t):
+        # nieaktualne wyszukiwania anuluje wątek UI, a spóźnione wyniki
+        # odrzuca on_route_ready po req
+        cached = ROUTE_CACHE.get(s, t, algo)
+        if cached is not None:
+            self.routeReady.emit(req, algo, dict(cached, calc_ms=0.0, cached=True))
+            return
 
+        try:
             t0 = time.perf_counter()
-            nodes_a, travel_time = astar_time(s, t)
-            time_a = (time.perf_counter() - t0) * 1000
-
-            if not nodes_a:
-                raise RuntimeError("Brak trasy (A*)")
+            if algo == "dijkstra":
+                result = shortest_route(s, t)
+            else:
+                result = fastest_route(s, t)
+            calc_ms = (time.perf_counter() - t0) * 1000
+
+            if not result:
+                raise RuntimeError(
+                    "Brak trasy (Dijkstra)" if algo == "dijkstra" else "Brak trasy (A*)"
+                )
+
+            result["calc_ms"] = calc_ms
+        except Exception as e:
+            self.routeFailed.emit(req, str(e))
+            return
 
-            len_a = get_path_stats(nodes_a)
-            coords_a = get_coords(nodes_a)
+        ROUTE_CACHE.put(s, t, algo, result)
+        self.routeReady.emit(req, algo, result)
 
+    def _search_pair(self, req, s, t):
+        # neo4j: Dijkstra i A* w jednym round-tripie, cache jak przy _search
+        cached = {algo: ROUTE_CACHE.get(s, t, algo) for algo in ("dijkstra", "astar")}
+        if all(c is not None for c in cached.values()):
+            for algo, c in cached.items():
+                self.routeReady.emit(req, algo, dict(c, calc_ms=0.0, cached=True))
+            return
 
-            self.view.page().runJavaScript("clearRoutes();")
+        try:
+            t0 = time.perf_counter()
+            results = route_pair(s, t)
+            calc_ms = (time.perf_counter() - t0) * 1000
+        except Exception as e:
+            self.routeFailed.emit(req, str(e))
+            return
 
+        for algo, result in results.items():
+            result["calc_ms"] = calc_ms
+            ROUTE_CACHE.put(s, t, algo, result)
+            self.routeReady.emit(req, algo, result)
 
-            self.view.page().runJavaScript(
-                f"drawRoute({json.dumps(coords_d)}, 'blue');"
-            )
-            self.view.page().runJavaScript(
-                f"drawRoute({json.dumps(coords_a)}, 'red');"
-            )
+    @pyqtSlot(float, float)
+    def compute_isochrone(self, y, x):
+        self.request_id += 1
+        req = self.request_id
 
+        for f in self.pending:
+            f.cancel()
+        self.pending = [self.pool.submit(self._isochrone, req, x, y)]
 
-            self.info.setText(
-                "\n".join([
-                    "Dijkstra – najkrótsza (Trasa niebieska)",
-                    f"  Długość: {len_d/1000:.2f} km",
-                    f"  Czas obliczeń: {time_d:.1f} ms",
-                    "",
-                    "A* – najszybsza (Trasa czerwona)",
-                    f"  Długość: {len_a/1000:.2f} km",
-                    f"  Czas przejazdu: {travel_time/60:.1f} min",
-                    f"  Czas obliczeń: {time_a:.1f} ms",
-                ])
-            )
+        self.info.setText("Obliczanie izochron...")
 
+    def _isochrone(self, req, x, y):
+        try:
+            t0 = time.perf_counter()
+            geojson = isochrones(*wgs84_to_1992(x, y), THRESHOLDS_MIN)
+            calc_ms = (time.perf_counter() - t0) * 1000
         except Exception as e:
-            self.info.setText(f" {e}")
+            self.routeFailed.emit(req, str(e))
+            return
+
+        self.isochroneReady.emit(req, geojson, calc_ms)
+
+    def on_isochrone_ready(self, req, geojson, calc_ms):
+        if req != self.request_id:
+            return
+
+        self.view.page().runJavaScript(f"drawIsochrones({json.dumps(geojson)});")
+
+        lines = ["Izochrony (czas przejazdu)"]
+        for f in reversed(geojson["features"]):
+            p = f["properties"]
+            lines.append(f"  {p['minutes']} min: {p['nodes']} węzłów")
+        lines.append(f"  Czas obliczeń: {calc_ms:.1f} ms")
+
+        self.info.setText("\n".join(lines))
+
+    def on_route_ready(self, req, algo, result):
+        if req != self.request_id:
+            return
+
+        self.results[algo] = result
+
+        color = "blue" if algo == "dijkstra" else "red"
+        self.view.page().runJavaScript(
+            f"drawRoute({json.dumps(result['coords'])}, '{color}');"
+        )
+
+        self.show_info()
+
+    def on_route_failed(self, req, msg):
+        if req != self.request_id:
+            return
+        self.info.setText(f" {msg}")
+
+    def show_info(self):
+        lines = []
+
+        d = self.results.get("dijkstra")
+        lines += ["Dijkstra – najkrótsza (Trasa niebieska)"]
+        if d:
+            lines += [
+                f"  Długość: {d['length']/1000:.2f} km",
+                f"  Czas przejazdu: {d['time']/60:.1f} min",
+                self._calc_line(d),
+            ]
+        else:
+            lines += ["  obliczanie..."]
+
+        a = self.results.get("astar")
+        lines += ["", "A* – najszybsza (Trasa czerwona)"]
+        if a:
+            lines += [
+                f"  Długość: {a['length']/1000:.2f} km",
+                f"  Czas przejazdu: {a['time']/60:.1f} min",
+                self._calc_line(a),
+            ]
+        else:
+            lines += ["  obliczanie..."]
+
+        st = ROUTE_CACHE.stats()
+        lines += [
+            "",
+            f"Cache tras: {st['hits']} trafień / {st['misses']} chybień "
+            f"({st['hit_rate']:.0%}), wpisów: {st['size']}"
+        ]
+
+        self.info.setText("\n".join(lines))
+
+    @staticmethod
+    def _calc_line(r):
+        if r.get("cached"):
+            return "  Czas obliczeń: z cache"
+        return f"  Czas obliczeń: {r['calc_ms']:.1f} ms"
+
+    def closeEvent(self, event):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        super().closeEvent(event)
 
 
 
@@ -0,0 +1,166 @@
+import csv
+import os
+
+from bulk_import import (
+    CONSTRAINT_QUERY, EDGE_INDEX_QUERY,
+    read_vertices, read_edges, import_rows
+)
+from instrument import stage
+
+
+DELETE_EDGES_QUERY = """
+UNWIND $rows AS id
+MATCH ()-[r:ROAD {edge_id: id}]->()
+DELETE r
+"""
+
+DELETE_NODES_QUERY = """
+UNWIND $rows AS id
+MATCH (n:Node {id: id})
+DETACH DELETE n
+"""
+
+# upserty zamiast CREATE z bulk_import – ponowienie przerwanej aktualizacji
+# (te same nowe ID) nie łamie ograniczenia node_id i nie dubluje odcinków
+UPSERT_NODES_QUERY = """
+UNWIND $rows AS r
+MERGE (n:Node {id: r.id})
+SET n += {x: r.x, y: r.y, x_astar: r.xa, y_astar: r.ya}
+"""
+
+UPSERT_EDGES_QUERY = """
+UNWIND $rows AS r
+MATCH (a:Node {id: r.from})
+MATCH (b:Node {id: r.to})
+MERGE (a)-[rel:ROAD {edge_id: r.id}]->(b)
+SET rel += {length: r.length, time: r.time, class: r.cls, oneway: r.oneway}
+"""
+
+
+def _vertex_key(r):
+    return (r["x"], r["y"])
+
+def _edge_key(r, coords):
+    # odcinek rozpoznajemy po treści (końce, klasa, długość, czas), nie po ID,
+    # bo nowy build numeruje wierzchołki i odcinki od zera; czas w kluczu –
+    # zmiana SPEED_MAP wymienia odcinki także w Neo4j, nie tylko w CSV
+    return (
+        coords[r["from"]], coords[r["to"]], r["cls"],
+        round(r["length"], 6), round(r["time"], 6), r["oneway"]
+    )
+
+
+def diff_graph(old_vertices_csv, old_edges_csv, new_vertices_csv, new_edges_csv):
+    """
+    Porównuje nowy build z zapisanym grafem. Niezmienione wierzchołki
+    i odcinki zachowują stare ID, nowe dostają kolejne wolne ID.
+    """
+    old_v = {r["id"]: r for r in read_vertices(old_vertices_csv)}
+    old_by_xy = {_vertex_key(r): vid for vid, r in old_v.items()}
+    old_xy = {vid: _vertex_key(r) for vid, r in old_v.items()}
+
+    old_edges = {}
+    max_edge = 0
+    for r in read_edges(old_edges_csv):
+        old_edges.setdefault(_edge_key(r, old_xy), []).append(r)
+        max_edge = max(max_edge, r["id"])
+
+    next_vertex = max(old_v, default=0) + 1
+    remap = {}
+    vertices = []
+    new_xy = {}
+    for r in read_vertices(new_vertices_csv):
+        key = _vertex_key(r)
+        vid = old_by_xy.get(key)
+        if vid is None:
+            vid, next_vertex = next_vertex, next_vertex + 1
+        remap[r["id"]] = vid
+        new_xy[r["id"]] = key
+        vertices.append(dict(r, id=vid))
+
+    edges = []
+    added_edges = []
+    next_edge = max_edge + 1
+    for r in read_edges(new_edges_csv):
+        same = old_edges.get(_edge_key(r, new_xy))
+        is_new = not same
+        if is_new:
+            eid, next_edge = next_edge, next_edge + 1
+        else:
+            eid = same.pop()["id"]
+
+        row = dict(r, id=eid)
+        row["from"], row["to"] = remap[r["from"]], remap[r["to"]]
+        edges.append(row)
+        if is_new:
+            added_edges.append(row)
+
+    kept_vertices = {r["id"] for r in vertices}
+
+    return {
+        "vertices": sorted(vertices, key=lambda r: r["id"]),
+        "edges": sorted(edges, key=lambda r: r["id"]),
+        "added_vertices": [r for r in vertices if r["id"] not in old_v],
+        "removed_vertices": sorted(set(old_v) - kept_vertices),
+        "added_edges": added_edges,
+        "removed_edges": sorted(r["id"] for rows in old_edges.values() for r in rows)
+    }
+
+
+def write_graph(diff, vertices_csv, edges_csv):
+    """
+    Zapisuje scalony graf jako nowe pliki odniesienia – przez pliki .tmp
+    i os.replace, żeby przerwany zapis nie zostawił uciętego CSV.
+    """
+    with open(vertices_csv + ".tmp", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["vertex_id", "x", "y", "x_astar", "y_astar"])
+        for r in diff["vertices"]:
+            w.writerow([r["id"], r["x"], r["y"], r["xa"], r["ya"]])
+
+    with open(edges_csv + ".tmp", "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["edge_id", "from_vertex", "to_vertex", "klasaDrogi", "length_m", "time_s", "oneway"])
+        for r in diff["edges"]:
+            w.writerow([r["id"], r["from"], r["to"], r["cls"], r["length"], r["time"], r["oneway"]])
+
+    os.replace(vertices_csv + ".tmp", vertices_csv)
+    os.replace(edges_csv + ".tmp", edges_csv)
+
+
+def is_empty(diff):
+    return not any(diff[k] for k in ("added_vertices", "removed_vertices", "added_edges", "removed_edges"))
+
+
+def apply_diff(driver, diff, batch_size):
+    """
+    Wprowadza do Neo4j tylko zmiany: usuwa znikające odcinki i węzły,
+    dodaje nowe. Każdy krok jest idempotentny, więc po przerwaniu wystarczy
+    uruchomić aktualizację ponownie. Projekcje GDS trzeba potem odświeżyć.
+    """
+    with stage("neo4j: indeksy") as rec, driver.session() as session:
+        session.run(CONSTRAINT_QUERY).consume()
+        session.run(EDGE_INDEX_QUERY).consume()
+        rec["round_trips"] = 2
+
+    print(
+        f"▶ Aktualizacja przyrostowa: +{len(diff['added_vertices'])}/-{len(diff['removed_vertices'])} węzłów, "
+        f"+{len(diff['added_edges'])}/-{len(diff['removed_edges'])} odcinków"
+    )
+    import_rows(driver, DELETE_EDGES_QUERY, diff["removed_edges"], batch_size, "usunięte odcinki")
+    import_rows(driver, DELETE_NODES_QUERY, diff["removed_vertices"], batch_size, "usunięte węzły")
+    import_rows(driver, UPSERT_NODES_QUERY, diff["added_vertices"], batch_size, "nowe węzły")
+    import_rows(driver, UPSERT_EDGES_QUERY, diff["added_edges"], batch_size, "nowe odcinki")
+
+
+def update_graph(new_vertices_csv, new_edges_csv, vertices_csv, edges_csv):
+    """
+    Tylko diff – zapisane CSV zostają bez zmian. Nowe pliki odniesienia
+    zapisuje write_graph dopiero po udanym apply_diff, inaczej przerwana
+    aktualizacja Neo4j nie byłaby już widoczna w następnym diffie.
+    """
+    diff = diff_graph(vertices_csv, edges_csv, new_vertices_csv, new_edges_csv)
+
+    os.remove(new_vertices_csv)
+    os.remove(new_edges_csv)
+    return diff
@@ -0,0 +1,128 @@
+import cProfile
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+# rekordy etapów w kolejności wykonania
+STAGES = []
+
+
+def start(trace_memory=False):
+    # tracemalloc spowalnia budowę kilkukrotnie (także w procesach puli
+    # utworzonych przez fork), stąd przełącznik
+    STAGES.clear()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def _rss_peak_mb():
+    # szczyt RSS od startu procesu (główny i zakończone procesy potomne)
+    if resource is None:
+        return None
+    kb = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    )
+    return kb / 2 ** 20 if sys.platform == "darwin" else kb / 2 ** 10
+
+
+def _log(rec):
+    extra = ""
+    if rec["rows"] and rec["time_s"] > 0:
+        extra += f" ({rec['rows'] / rec['time_s']:.0f} wierszy/s)"
+    if rec.get("round_trips"):
+        extra += f", {rec['round_trips']} zapytań"
+    if rec.get("peak_mb") is not None:
+        extra += f", szczyt {rec['peak_mb']:.1f} MB"
+    if rec.get("rss_peak_mb") is not None:
+        extra += f", RSS {rec['rss_peak_mb']:.0f} MB"
+    print(f"   [{rec['stage']}] {rec['time_s']:.2f} s, {rec['rows']} wierszy{extra}")
+
+
+@contextmanager
+def stage(name, rows=0):
+    """
+    Pomiar etapu: czas, liczba wierszy, szczyt pamięci Pythona w etapie
+    (tracemalloc, jeśli włączony), szczyt RSS procesu i liczba zapytań do
+    bazy. Wiersze i zapytania uzupełnia wywołujący przez zwrócony słownik.
+    """
+    rec = {"stage": name, "rows": rows, "round_trips": 0, "peak_mb": None, "rss_peak_mb": None}
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.reset_peak()
+
+    t0 = time.perf_counter()
+    try:
+        yield rec
+    finally:
+        rec["time_s"] = time.perf_counter() - t0
+        if tracing:
+            rec["peak_mb"] = tracemalloc.get_traced_memory()[1] / 2 ** 20
+        rec["rss_peak_mb"] = _rss_peak_mb()
+        STAGES.append(rec)
+        _log(rec)
+
+
+def add(name, time_s, rows=0, **extra):
+    # etap zmierzony gdzie indziej, np. suma czasów procesów puli
+    rec = {
+        "stage": name, "rows": rows, "round_trips": 0,
+        "peak_mb": None, "rss_peak_mb": _rss_peak_mb(), "time_s": time_s
+    }
+    rec.update(extra)
+    STAGES.append(rec)
+    _log(rec)
+
+
+def save(path, **meta):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(dict(meta, stages=STAGES), f, indent=2)
+    print(f"▶ Statystyki etapów: {path}")
+
+
+@contextmanager
+def profiled(kind, path):
+    """
+    Profil całego bloku: "cprofile" (plik .prof + 20 najdroższych funkcji)
+    albo "pyinstrument" (raport .html, jeśli pakiet jest zainstalowany).
+    """
+    if kind == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+        try:
+            yield
+        finally:
+            prof.disable()
+            prof.dump_stats(path + ".prof")
+            pstats.Stats(prof).sort_stats("cumulative").print_stats(20)
+            print(f"▶ Profil: {path}.prof")
+
+    elif kind == "pyinstrument":
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            print("Brak pakietu pyinstrument – profilowanie wyłączone")
+            yield
+            return
+
+        prof = Profiler()
+        prof.start()
+        try:
+            yield
+        finally:
+            prof.stop()
+            with open(path + ".html", "w", encoding="utf-8") as f:
+                f.write(prof.output_html())
+            print(f"▶ Profil: {path}.html")
+
+    else:
+        yield
@@ -0,0 +1,106 @@
+import json
+import math
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+
+import routing
+
+
+THRESHOLDS_MIN = (5, 10, 15)
+
+# "concave" – otoczka wklęsła końców osiągalnych odcinków (szybka),
+# "buffer" – suma buforów odcinków (dokładniejsza, wolniejsza)
+METHOD = "concave"
+CONCAVE_RATIO = 0.1
+BUFFER_M = 60
+SIMPLIFY_M = 10
+
+_to_wgs = Transformer.from_crs("EPSG:2180", "EPSG:4326", always_xy=True)
+
+
+def _to_wgs_coords(xy):
+    lon, lat = _to_wgs.transform(xy[:, 0], xy[:, 1])
+    return np.column_stack([lon, lat])
+
+
+def reach_times(graph, s, max_time):
+    """
+    Czas dojazdu [s] do każdego węzła (inf poza zasięgiem) – jeden
+    ograniczony Dijkstra po time_s, przerwany po największym progu.
+    """
+    done = graph.one_to_many(s, metric="time", cutoff=max_time)
+
+    t = np.full(graph.n_nodes, math.inf)
+    nodes = np.fromiter(done.keys(), dtype=np.int64, count=len(done))
+    t[nodes] = [done[v][0] for v in nodes.tolist()]
+    return t
+
+
+def reachable_lines(graph, t, limit):
+    # odcinki osiągalne w limicie: całe, gdy oba końce w zasięgu,
+    # w przeciwnym razie część od bliższego końca (proporcjonalnie do czasu)
+    a, b = graph.edge_from, graph.edge_to
+    ta, tb = t[a], t[b]
+    et = graph.edge_time
+
+    swap = tb < ta
+    near = np.where(swap, b, a)
+    far = np.where(swap, a, b)
+    t_near = np.minimum(ta, tb)
+    t_far = np.maximum(ta, tb)
+
+    m = t_near <= limit
+    near, far, t_near, t_far, et = near[m], far[m], t_near[m], t_far[m], et[m]
+
+    frac = np.where(t_far <= limit, 1.0, np.clip((limit - t_near) / np.maximum(et, 1e-9), 0.0, 1.0))
+
+    x0, y0 = graph.x[near], graph.y[near]
+    x1 = x0 + (graph.x[far] - x0) * frac
+    y1 = y0 + (graph.y[far] - y0) * frac
+
+    coords = np.stack([np.column_stack([x0, y0]), np.column_stack([x1, y1])], axis=1)
+    return shapely.linestrings(coords)
+
+
+def lines_to_polygon(lines, method=None):
+    if (method or METHOD) == "buffer":
+        # bufory pojedynczych odcinków + union_all jest wielokrotnie szybsze
+        # niż buforowanie całej sumy naraz
+        poly = shapely.union_all(shapely.buffer(lines, BUFFER_M, quad_segs=2))
+    else:
+        points = shapely.multipoints(shapely.get_coordinates(lines))
+        poly = shapely.concave_hull(points, ratio=CONCAVE_RATIO)
+
+    return poly.simplify(SIMPLIFY_M)
+
+
+def isochrones(x, y, thresholds_min=THRESHOLDS_MIN, max_dist=150):
+    """
+    Izochrony z punktu (EPSG:2180) jako GeoJSON w WGS84. Wszystkie progi
+    korzystają z jednego wyszukiwania, poligony budowane wg METHOD.
+    """
+    g = routing.get_graph()
+    s = g.nearest(x, y, max_dist)
+    if s is None:
+        raise RuntimeError("Brak drogi w pobliżu punktu")
+
+    limits = sorted(thresholds_min)
+    t = reach_times(g, s, limits[-1] * 60)
+
+    features = []
+    for minutes in reversed(limits):
+        lines = reachable_lines(g, t, minutes * 60)
+        if len(lines) == 0:
+            continue
+
+        poly = shapely.transform(lines_to_polygon(lines), _to_wgs_coords)
+
+        features.append({
+            "type": "Feature",
+            "properties": {"minutes": minutes, "nodes": int((t <= minutes * 60).sum())},
+            "geometry": json.loads(shapely.to_geojson(poly))
+        })
+
+    return {"type": "FeatureCollection", "features": features}
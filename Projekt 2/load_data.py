@@ -1,223 +1,227 @@
-import arcpy
-import math
 import csv
 import os
 import time
+import numpy as np
 from neo4j import GraphDatabase
 
-arcpy.env.overwriteOutput = True
-
-
-PATH = r"dane\L4_1_BDOT10k__OT_SKJZ_L.shp"
+from tiles import build_tiles
+from bulk_import import bulk_load, write_admin_import, PROJECT_QUERY
+from incremental import update_graph, apply_diff, is_empty, write_graph
+from routing import write_graph_version, load_graph_csv, save_binary
+import ch
+import alt
+import instrument
+from instrument import stage
+from profiles import V_MAX, SPEED_MAP, DEFAULT_SPEED
+
+PATHS = [
+    os.path.join("dane", "L4_1_BDOT10k__OT_SKJZ_L.shp"),
+    os.path.join("dane", "L4_2_BDOT10k__OT_SKJZ_L.shp"),
+]
 OUT_DIR = r"wyniki"
 
+# liczba odcinków w jednej paczce czytanej z .shp
+CHUNK_SIZE = 50000
+# procesy do snappingu kafli (None = liczba rdzeni)
+TILE_WORKERS = None
+
 TOLERANCJA = 0.5
+# pole .dbf z kierunkiem ruchu (1: zgodnie z geometrią, -1: przeciwnie,
+# 0/puste: oba); None – wszystkie odcinki dwukierunkowe
+ONEWAY_FIELD = None
 
 NEO4J_URI = "bolt://127.0.0.1:7687"
 NEO4J_AUTH = ("neo4j", "adminadmin")
 
-
-V_MAX_KMH = 140
-V_MAX = V_MAX_KMH / 3.6  # m/s
-
-SPEED_MAP = {
-    "A": 140,
-    "S": 120,
-    "GP": 100,
-    "G": 90,
-    "Z": 50,
-    "L": 50,
-    "D": 50,
-    "I": 50
-}
-
-
-TIMINGS = {
-    "vertex": 0.0,
-    "total": 0.0
-}
-
-
-def load_data(path: str):
-    fields = ["Shape@", "klasaDrogi"]
-    data = []
-
-    with arcpy.da.SearchCursor(path, fields) as cur:
-        for geom, klasa in cur:
-            if not geom or not geom.firstPoint or not geom.lastPoint:
-                continue
-
-            data.append({
-                "start": (geom.firstPoint.X, geom.firstPoint.Y),
-                "end": (geom.lastPoint.X, geom.lastPoint.Y),
-                "length": float(geom.length),
-                "klasa": klasa
-            })
-
-    return data
-
-
-def find_or_create_vertex(point, vertices):
-    t0 = time.perf_counter()
-
-    for vid, (x, y) in vertices.items():
-        if math.hypot(x - point[0], y - point[1]) <= TOLERANCJA:
-            TIMINGS["vertex"] += time.perf_counter() - t0
-            return vid
-
-    new_id = len(vertices) + 1
-    vertices[new_id] = point
-
-    TIMINGS["vertex"] += time.perf_counter() - t0
-    return new_id
-
-
-
-t_start = time.perf_counter()
-
-
-data = load_data(PATH)
-
-vertices = {}
-edges = []
-
-
-for edge_id, rec in enumerate(data, start=1):
-    v_from = find_or_create_vertex(rec["start"], vertices)
-    v_to = find_or_create_vertex(rec["end"], vertices)
-
-    speed_kmh = SPEED_MAP.get(rec["klasa"], 50)
-    speed_m_s = speed_kmh / 3.6
-    travel_time = rec["length"] / speed_m_s
-
-    edges.append([
-        edge_id,
-        v_from,
-        v_to,
-        rec["klasa"],
-        rec["length"],
-        travel_time
-    ])
-
-TIMINGS["total"] = time.perf_counter() - t_start
-
-
-os.makedirs(OUT_DIR, exist_ok=True)
-
-vertices_csv = os.path.join(OUT_DIR, "vertices.csv")
-edges_csv = os.path.join(OUT_DIR, "edges.csv")
-
-
-with open(vertices_csv, "w", newline="", encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow(["vertex_id", "x", "y", "x_astar", "y_astar"])
-    for vid, (x, y) in vertices.items():
+# wielkość partii UNWIND przy imporcie do Neo4j
+BATCH_SIZE = 5000
+# True – zamiast importu przez Bolt tylko paczka CSV dla neo4j-admin import
+# (ładowanie na zimno, baza zatrzymana); projekcje GDS po starcie bazy
+ADMIN_IMPORT = False
+# True – diff z zapisanym wyniki/edges.csv i aktualizacja tylko zmienionych
+# węzłów/odcinków w Neo4j zamiast pełnego MATCH (n) DETACH DELETE n
+INCREMENTAL = False
+# preprocessing Contraction Hierarchies (wyniki/ch_length.npz, ch_time.npz)
+BUILD_CH = True
+# tablice landmarków ALT dla A* (wyniki/alt_length.npz, alt_time.npz)
+BUILD_ALT = True
+
+
+# statystyki etapów (czas, wiersze, szczyt pamięci, zapytania) -> JSON
+STATS_JSON = os.path.join(OUT_DIR, "build_stats.json")
+# szczyt pamięci każdego etapu przez tracemalloc (budowa kilka razy wolniejsza);
+# szczyt RSS procesu jest zapisywany zawsze
+TRACE_MEMORY = False
+# None, "cprofile" albo "pyinstrument" – profil całego main() w wyniki/load_data.*
+PROFILE = None
+
+
+def travel_times(klasa, length):
+    speed_kmh = np.array([SPEED_MAP.get(k, DEFAULT_SPEED) for k in klasa], dtype=float)
+    return length / (speed_kmh / 3.6)
+
+
+def build_graph(paths, vertices_csv, edges_csv):
+    vertices = {}
+    n_edges = 0
+    tiles = {"segments": 0, "read_time": 0.0, "snap_time": 0.0, "stitch_time": 0.0}
+    write_time = 0.0
+
+    print(f"▶ Budowa grafu z {len(paths)} kafli")
+
+    # kafle są snapowane równolegle i sklejane na szwach, odcinki trafiają
+    # do edges.csv od razu – w pamięci zostaje tylko słownik wierzchołków
+    with stage("budowa grafu") as rec, open(edges_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
         w.writerow([
-            vid,
-            x,
-            y,
-            x / V_MAX,
-            y / V_MAX
+            "edge_id",
+            "from_vertex",
+            "to_vertex",
+            "klasaDrogi",
+            "length_m",
+            "time_s",
+            "oneway"
         ])
 
-
-with open(edges_csv, "w", newline="", encoding="utf-8") as f:
-    w = csv.writer(f)
-    w.writerow([
-        "edge_id",
-        "from_vertex",
-        "to_vertex",
-        "klasaDrogi",
-        "length_m",
-        "time_s"
-    ])
-    for e in edges:
-        w.writerow(e)
-
-
-driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
-
-def run(query, params=None):
-    with driver.session() as session:
-        session.run(query, params or {})
-
-
-run("MATCH (n) DETACH DELETE n")
-
-
-with open(vertices_csv, encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for r in reader:
-        run("""
-        CREATE (:Node {
-            id: $id,
-            x: $x,
-            y: $y,
-            x_astar: $xa,
-            y_astar: $ya
-        })
-        """, {
-            "id": int(r["vertex_id"]),
-            "x": float(r["x"]),
-            "y": float(r["y"]),
-            "xa": float(r["x_astar"]),
-            "ya": float(r["y_astar"])
-        })
-
-run("""
-CREATE CONSTRAINT node_id IF NOT EXISTS
-FOR (n:Node) REQUIRE n.id IS UNIQUE
-""")
-
-
-with open(edges_csv, encoding="utf-8") as f:
-    reader = csv.DictReader(f)
-    for r in reader:
-        run("""
-        MATCH (a:Node {id:$from})
-        MATCH (b:Node {id:$to})
-        CREATE (a)-[:ROAD {
-            length: $length,
-            time: $time,
-            class: $cls
-        }]->(b)
-        CREATE (b)-[:ROAD {
-            length: $length,
-            time: $time,
-            class: $cls
-        }]->(a)
-        """, {
-            "from": int(r["from_vertex"]),
-            "to": int(r["to_vertex"]),
-            "length": float(r["length_m"]),
-            "time": float(r["time_s"]),
-            "cls": r["klasaDrogi"]
-        })
-
-
-print("▶ Inicjalizacja GDS...")
-
-run("CALL gds.graph.drop('roads_length', false)")
-run("CALL gds.graph.drop('roads_time', false)")
-
-run("""
-CALL gds.graph.project(
-    'roads_length',
-    'Node',
-    { ROAD: { orientation:'UNDIRECTED', properties:'length' } }
-)
-""")
-
-run("""
-CALL gds.graph.project(
-    'roads_time',
-    'Node',
-    { ROAD: { orientation:'UNDIRECTED', properties:'time' } },
-    { nodeProperties:['x_astar','y_astar'] }
-)
-""")
-
-driver.close()
-
-
-
+        for ids, klasa, length, oneway, stats in build_tiles(
+                paths, TOLERANCJA, CHUNK_SIZE, vertices, TILE_WORKERS, ONEWAY_FIELD):
+            for key in tiles:
+                tiles[key] += stats[key]
+
+            t0 = time.perf_counter()
+            times = travel_times(klasa, length).tolist()
+
+            for (v_from, v_to), k, l, travel_time, ow in zip(
+                    ids.tolist(), klasa.tolist(), length.tolist(), times, oneway.tolist()):
+                n_edges += 1
+                w.writerow([
+                    n_edges,
+                    v_from,
+                    v_to,
+                    k,
+                    l,
+                    travel_time,
+                    ow
+                ])
+            write_time += time.perf_counter() - t0
+
+        rec["rows"] = n_edges
+
+    # odczyt i snapping idą w procesach puli – czasy to suma po kaflach
+    instrument.add("odczyt shp", tiles["read_time"], tiles["segments"], workers="suma")
+    instrument.add("snapping", tiles["snap_time"], 2 * n_edges, workers="suma")
+    instrument.add("sklejanie szwów", tiles["stitch_time"], len(vertices))
+    instrument.add("zapis edges.csv", write_time, n_edges)
+
+    with stage("zapis vertices.csv", len(vertices)), \
+            open(vertices_csv, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(["vertex_id", "x", "y", "x_astar", "y_astar"])
+        for vid, (x, y) in vertices.items():
+            w.writerow([
+                vid,
+                x,
+                y,
+                x / V_MAX,
+                y / V_MAX
+            ])
+
+    print(
+        f"▶ Snapping: {2 * n_edges} punktów -> {len(vertices)} wierzchołków "
+        f"w {tiles['snap_time']:.3f} s "
+        f"({2 * n_edges / max(tiles['snap_time'], 1e-9):.0f} pkt/s)"
+    )
+
+
+def init_gds(driver):
+    print("▶ Inicjalizacja GDS...")
+
+    with stage("gds: projekcje") as rec, driver.session() as session:
+        def run(query, params=None):
+            rec["round_trips"] += 1
+            return session.run(query, params or {}).data()
+
+        run("CALL gds.graph.drop('roads_length', false)")
+        run("CALL gds.graph.drop('roads_time', false)")
+
+        for name in ("roads_length", "roads_time"):
+            rec["rows"] += sum(r["relationships"] for r in run(PROJECT_QUERY, {"name": name}))
+
+
+def main():
+    os.makedirs(OUT_DIR, exist_ok=True)
+    instrument.start(TRACE_MEMORY)
+    t_start = time.perf_counter()
+
+    with instrument.profiled(PROFILE, os.path.join(OUT_DIR, "load_data")):
+        build_and_load()
+
+    instrument.save(STATS_JSON, total_s=time.perf_counter() - t_start, paths=PATHS)
+
+
+def build_and_load():
+    vertices_csv = os.path.join(OUT_DIR, "vertices.csv")
+    edges_csv = os.path.join(OUT_DIR, "edges.csv")
+
+    # build idzie do plików .new – vertices.csv/edges.csv opisują graf
+    # w Neo4j i są podmieniane dopiero po udanym imporcie
+    new_vertices_csv = os.path.join(OUT_DIR, "vertices.new.csv")
+    new_edges_csv = os.path.join(OUT_DIR, "edges.new.csv")
+    build_graph(PATHS, new_vertices_csv, new_edges_csv)
+
+    diff = None
+    if ADMIN_IMPORT:
+        # baza jest zatrzymana – bez połączenia z Neo4j, paczka od razu po budowie
+        with stage("paczka neo4j-admin"):
+            write_admin_import(new_vertices_csv, new_edges_csv, os.path.join(OUT_DIR, "import"))
+    elif INCREMENTAL and os.path.exists(vertices_csv) and os.path.exists(edges_csv):
+        with stage("diff z poprzednim grafem") as rec:
+            diff = update_graph(new_vertices_csv, new_edges_csv, vertices_csv, edges_csv)
+            rec["rows"] = len(diff["edges"])
+
+        if is_empty(diff):
+            print("▶ Brak zmian w grafie")
+            return
+
+    if not ADMIN_IMPORT:
+        driver = GraphDatabase.driver(NEO4J_URI, auth=NEO4J_AUTH)
+
+        if diff is not None:
+            apply_diff(driver, diff, BATCH_SIZE)
+        else:
+            bulk_load(driver, new_vertices_csv, new_edges_csv, BATCH_SIZE)
+        init_gds(driver)
+
+        driver.close()
+
+    # Neo4j i projekcje GDS są aktualne (albo paczka neo4j-admin gotowa) –
+    # dopiero teraz nowy graf staje się odniesieniem dla następnego diffu
+    # i źródłem plików routingu
+    if diff is not None:
+        write_graph(diff, vertices_csv, edges_csv)
+    else:
+        os.replace(new_vertices_csv, vertices_csv)
+        os.replace(new_edges_csv, edges_csv)
+
+    version = write_graph_version(OUT_DIR)
+    print(f"▶ Wersja grafu: {version}")
+
+    # format binarny do szybkiego startu routingu (CSV zostaje dla Neo4j)
+    with stage("format binarny") as rec:
+        graph = load_graph_csv(OUT_DIR)
+        save_binary(graph, OUT_DIR, version)
+        rec["rows"] = len(graph.edge_from)
+
+    if BUILD_CH:
+        with stage("CH", 2 * len(graph.edge_from)):
+            ch.build_and_save(OUT_DIR)
+
+    if BUILD_ALT:
+        with stage("ALT", graph.n_nodes):
+            alt.build_and_save(OUT_DIR)
+
+
+# snapping kafli działa w puli procesów – na Windows (spawn) moduł jest
+# importowany ponownie w każdym procesie, więc całość tylko pod __main__
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from pyproj import Transformer
+
+import routing
+from routing import GRAPH_DIR
+
+
+_to_1992 = Transformer.from_crs("EPSG:4326", "EPSG:2180", always_xy=True)
+
+STATIONS_GEOJSON = os.path.join("..", "Projekt 1", "Dane administracyjne", "Dane", "effacility.geojson")
+
+
+def snap_points(points, crs="EPSG:4326", max_dist=150, graph=None):
+    """
+    Punkty (x, y) / (lon, lat) -> indeksy węzłów grafu (domyślnie
+    routing.get_graph()), -1 gdy brak drogi w promieniu max_dist. Cała
+    lista jest transformowana i przyciągana naraz.
+    """
+    pts = np.asarray(points, dtype=float).reshape(-1, 2)
+    x, y = pts[:, 0], pts[:, 1]
+    if crs == "EPSG:4326":
+        x, y = _to_1992.transform(x, y)
+    elif crs != "EPSG:2180":
+        x, y = Transformer.from_crs(crs, "EPSG:2180", always_xy=True).transform(x, y)
+
+    g = graph if graph is not None else routing.get_graph()
+    return g.nearest_many(x, y, max_dist)
+
+
+_worker_graph = None
+
+def _init_worker(graph_dir):
+    global _worker_graph
+    _worker_graph = routing.load_graph(graph_dir)
+
+def _rows(task, graph=None):
+    origins, targets, metric = task
+    g = graph if graph is not None else _worker_graph
+    wanted = [t for t in set(targets) if t >= 0]
+
+    times = np.full((len(origins), len(targets)), np.nan)
+    dists = np.full((len(origins), len(targets)), np.nan)
+
+    for i, s in enumerate(origins):
+        if s < 0:
+            continue
+        done = g.one_to_many(s, wanted, metric)
+        for j, t in enumerate(targets):
+            if t in done:
+                times[i, j], dists[i, j] = done[t]
+
+    return times, dists
+
+
+def travel_matrix(origins, destinations, crs="EPSG:4326", max_dist=150,
+                  metric="time", workers=None, chunk=8, graph_dir=GRAPH_DIR):
+    """
+    Macierz czasów przejazdu [s] i długości tras [m] (wzdłuż najszybszej
+    ścieżki) między listami punktów. Każdy wiersz to jedno wyszukiwanie
+    one-to-many, wiersze liczone równolegle w puli procesów.
+    NaN oznacza punkt bez drogi w pobliżu albo brak połączenia.
+    """
+    t0 = time.perf_counter()
+
+    # snapping i wiersze liczone w tym procesie muszą iść po tym samym
+    # grafie co procesy puli – indeksy węzłów są własne dla grafu
+    if os.path.abspath(graph_dir) == os.path.abspath(GRAPH_DIR):
+        graph = routing.get_graph()
+    else:
+        graph = routing.load_graph(graph_dir)
+
+    src = snap_points(origins, crs, max_dist, graph).tolist()
+    dst = snap_points(destinations, crs, max_dist, graph).tolist()
+
+    tasks = [(src[i:i + chunk], dst, metric) for i in range(0, len(src), chunk)]
+    workers = workers or os.cpu_count() or 1
+
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(graph_dir,)) as pool:
+            parts = list(pool.map(_rows, tasks))
+    else:
+        parts = [_rows(t, graph) for t in tasks]
+
+    if parts:
+        times = np.vstack([p[0] for p in parts])
+        dists = np.vstack([p[1] for p in parts])
+    else:
+        times = dists = np.empty((0, len(dst)))
+
+    dt = time.perf_counter() - t0
+    cells = times.size
+    print(
+        f"▶ Macierz {len(src)}x{len(dst)}: {dt:.2f} s, "
+        f"{cells / max(dt, 1e-9):.0f} komórek/s ({workers} proc.)"
+    )
+
+    return times, dists
+
+
+def load_stations(path=STATIONS_GEOJSON):
+    with open(path, encoding="utf-8") as f:
+        gj = json.load(f)
+
+    names, points = [], []
+    for feat in gj["features"]:
+        names.append(feat["properties"].get("name1"))
+        points.append(feat["geometry"]["coordinates"][:2])
+
+    return names, np.asarray(points, dtype=float)
+
+
+if __name__ == "__main__":
+    # przykład: stacje IMGW (EPSG:2180) leżące przy sieci drogowej
+    names, pts = load_stations()
+    snapped = snap_points(pts, "EPSG:2180")
+    pts = pts[snapped >= 0]
+    names = [n for n, s in zip(names, snapped) if s >= 0]
+
+    times, dists = travel_matrix(pts, pts, crs="EPSG:2180")
+    for name, row in zip(names, times):
+        print(name, np.round(row / 60, 1))
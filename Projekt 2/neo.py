@@ -1,15 +1,67 @@
+import threading
+import time
+
+import numpy as np
 from neo4j import GraphDatabase
 from pyproj import Transformer
 
+import routing
+from bulk_import import PROJECT_QUERY
+
 
 URI = "bolt://localhost:7687"
 AUTH = ("neo4j", "adminadmin")
 
 driver = GraphDatabase.driver(URI, auth=AUTH)
 
-def run(q, p=None):
-    with driver.session() as s:
-        return list(s.run(q, p or {}))
+# jedna sesja na wątek, utrzymywana między zapytaniami (sesje nie są thread-safe)
+_local = threading.local()
+
+# statystyki zapytań są aktualizowane z wielu wątków (pula w gui.py)
+QUERY_TIMINGS = {}
+_timings_lock = threading.Lock()
+
+
+def _session():
+    s = getattr(_local, "session", None)
+    if s is None or s.closed():
+        s = _local.session = driver.session()
+    return s
+
+def _fetch(tx, q, p):
+    return list(tx.run(q, p))
+
+def _record(name, dt):
+    with _timings_lock:
+        st = QUERY_TIMINGS.setdefault(name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        st["count"] += 1
+        st["total_ms"] += dt * 1000
+        st["max_ms"] = max(st["max_ms"], dt * 1000)
+
+def run(q, p=None, name="query"):
+    t0 = time.perf_counter()
+    rows = _session().execute_read(_fetch, q, p or {})
+    _record(name, time.perf_counter() - t0)
+    return rows
+
+def run_write(q, p=None, name="write"):
+    t0 = time.perf_counter()
+    rows = _session().execute_write(_fetch, q, p or {})
+    _record(name, time.perf_counter() - t0)
+    return rows
+
+def query_stats():
+    with _timings_lock:
+        return {
+            name: dict(st, avg_ms=st["total_ms"] / st["count"])
+            for name, st in QUERY_TIMINGS.items()
+        }
+
+def close():
+    s = getattr(_local, "session", None)
+    if s is not None:
+        s.close()
+    driver.close()
 
 
 _to_1992 = Transformer.from_crs("EPSG:4326", "EPSG:2180", always_xy=True)
@@ -23,40 +75,34 @@ def to_wgs(x, y):
     return _to_wgs.transform(x, y)
 
 def init_gds():
-    run("CALL gds.graph.drop('roads_length', false)")
-    run("CALL gds.graph.drop('roads_time', false)")
-
-    run("""
-    CALL gds.graph.project(
-        'roads_length',
-        'Node',
-        { ROAD: { orientation:'UNDIRECTED', properties:'length' } }
-    )
-    """)
+    run_write("CALL gds.graph.drop('roads_length', false)", name="gds_drop")
+    run_write("CALL gds.graph.drop('roads_time', false)", name="gds_drop")
 
-    run("""
-    CALL gds.graph.project(
-        'roads_time',
-        'Node',
-        { ROAD: { orientation:'UNDIRECTED', properties:'time' } },
-        { nodeProperties:['x_astar','y_astar'] }
-    )
-    """)
+    run_write(PROJECT_QUERY, {"name": "roads_length"}, name="gds_project")
+    run_write(PROJECT_QUERY, {"name": "roads_time"}, name="gds_project")
 
 def find_nearest_node(x, y, max_dist=150):
-    r = run("""
-    MATCH (n:Node)
-    WITH n, sqrt((n.x-$x)^2 + (n.y-$y)^2) AS d
-    WHERE d < $max
-    RETURN id(n) AS id
-    ORDER BY d
-    LIMIT 1
-    """, {"x": x, "y": y, "max": max_dist})
+    # indeks przestrzenny z wyniki/vertices.csv, w bazie tylko lookup po n.id
+    return find_nearest_nodes([x], [y], max_dist)[0]
 
-    if not r:
+def find_nearest_nodes(xs, ys, max_dist=150):
+    vids = routing.find_nearest_nodes(xs, ys, max_dist).tolist()
+
+    if min(vids, default=0) < 0:
         raise RuntimeError("Brak drogi w pobliżu punktu")
 
-    return r[0]["id"]
+    return node_ids(vids)
+
+def node_ids(vids):
+    # vertex_id -> wewnętrzne id(n) używane przez procedury GDS
+    rows = run("""
+    UNWIND $vids AS vid
+    MATCH (n:Node {id: vid})
+    RETURN vid, id(n) AS id
+    """, {"vids": vids}, name="nearest")
+
+    ids = {r["vid"]: r["id"] for r in rows}
+    return [ids[v] for v in vids]
 
 def dijkstra_length(s, t):
     r = run("""
@@ -68,7 +114,7 @@ def dijkstra_length(s, t):
     )
     YIELD nodeIds, totalCost
     RETURN nodeIds, totalCost
-    """, {"s": s, "t": t})
+    """, {"s": s, "t": t}, name="dijkstra")
 
     return (r[0]["nodeIds"], r[0]["totalCost"]) if r else ([], None)
 
@@ -88,7 +134,7 @@ def astar_time(s, t):
     )
     YIELD nodeIds, totalCost
     RETURN nodeIds, totalCost
-    """, {"s": s, "t": t})
+    """, {"s": s, "t": t}, name="astar")
 
     return (r[0]["nodeIds"], r[0]["totalCost"]) if r else ([], None)
 
@@ -98,22 +144,123 @@ def get_coords(node_ids):
     MATCH (n:Node)
     WHERE id(n)=i
     RETURN n.x AS x, n.y AS y
-    """, {"ids": node_ids})
+    """, {"ids": node_ids}, name="coords")
 
-    coords = []
-    for r in rows:
-        lon, lat = to_wgs(r["x"], r["y"])
-        coords.append([lat, lon])
+    xs = np.array([r["x"] for r in rows], dtype=float)
+    ys = np.array([r["y"] for r in rows], dtype=float)
+    lon, lat = _to_wgs.transform(xs, ys)
 
-    return coords
+    return np.column_stack([lat, lon]).tolist()
 
 
 def get_path_stats(node_ids):
+    # odcinek to jedna relacja w dowolnym kierunku – przy kilku równoległych
+    # bierzemy najkrótszą
     r = run("""
     UNWIND range(0, size($ids)-2) AS i
     MATCH (a:Node)-[r:ROAD]-(b:Node)
     WHERE id(a)=$ids[i] AND id(b)=$ids[i+1]
-    RETURN sum(r.length) AS len
-    """, {"ids": node_ids})
+    WITH i, min(r.length) AS len
+    RETURN sum(len) AS len
+    """, {"ids": node_ids}, name="path_stats")
+
+    return float(r[0]["len"] or 0.0)
+
+
+def _route_subquery(proc, graph, weight, prefix, extra=""):
+    # ścieżka z GDS + relacja użyta na każdym kroku (najtańsza w danej metryce
+    # spośród dozwolonych w kierunku jazdy)
+    return f"""
+CALL {{
+    WITH a, b
+    CALL gds.shortestPath.{proc}.stream(
+        '{graph}',
+        {{ sourceNode:a, targetNode:b, {extra}relationshipWeightProperty:'{weight}' }}
+    )
+    YIELD nodeIds, totalCost
+    WITH nodeIds, totalCost, [i IN nodeIds | gds.util.asNode(i)] AS ns
+    UNWIND range(0, size(ns)-2) AS i
+    CALL {{
+        WITH ns, i
+        WITH ns[i] AS x, ns[i+1] AS y
+        MATCH (x)-[r:ROAD]-(y)
+        WHERE coalesce(r.oneway, 0) = 0
+           OR (r.oneway = 1 AND startNode(r) = x)
+           OR (r.oneway = -1 AND startNode(r) = y)
+        RETURN r
+        ORDER BY r.{weight}
+        LIMIT 1
+    }}
+    WITH nodeIds, totalCost, ns, i, r
+    ORDER BY i
+    RETURN
+        nodeIds AS {prefix}_ids,
+        totalCost AS {prefix}_cost,
+        [n IN ns | n.x] AS {prefix}_x,
+        [n IN ns | n.y] AS {prefix}_y,
+        collect(r.length) AS {prefix}_len,
+        collect(r.time) AS {prefix}_time
+}}
+"""
+
+_DIJKSTRA = _route_subquery("dijkstra", "roads_length", "length", "d")
+_ASTAR = _route_subquery(
+    "astar", "roads_time", "time", "a",
+    "longitudeProperty:'x_astar', latitudeProperty:'y_astar', "
+)
+
+
+def _make_route(r, prefix):
+    return routing.make_route(
+        r[f"{prefix}_ids"], r[f"{prefix}_cost"],
+        r[f"{prefix}_x"], r[f"{prefix}_y"],
+        r[f"{prefix}_len"], r[f"{prefix}_time"]
+    )
+
+def shortest_route(s, t):
+    r = run(
+        "MATCH (a:Node),(b:Node) WHERE id(a)=$s AND id(b)=$t" + _DIJKSTRA + "RETURN *",
+        {"s": s, "t": t}, name="shortest_route"
+    )
+    return _make_route(r[0], "d") if r else None
+
+def fastest_route(s, t):
+    r = run(
+        "MATCH (a:Node),(b:Node) WHERE id(a)=$s AND id(b)=$t" + _ASTAR + "RETURN *",
+        {"s": s, "t": t}, name="fastest_route"
+    )
+    return _make_route(r[0], "a") if r else None
+
+
+ROUTE_PAIR_QUERY = (
+    "MATCH (a:Node {id: $s}), (b:Node {id: $t})"
+    + _DIJKSTRA + _ASTAR +
+    "RETURN *"
+)
+
+
+def snap_pair(sx, sy, ex, ey, max_dist=150):
+    """
+    vertex_id najbliższych węzłów startu i końca – z indeksu w pamięci,
+    bez zapytania do bazy.
+    """
+    vids = routing.find_nearest_nodes([sx, ex], [sy, ey], max_dist).tolist()
+    if min(vids) < 0:
+        raise RuntimeError("Brak drogi w pobliżu punktu")
+    if vids[0] == vids[1]:
+        raise RuntimeError("Start i koniec na tym samym węźle")
+    return vids[0], vids[1]
+
+def route_pair(s, t):
+    """
+    Obie trasy między vertex_id s i t (z snap_pair) w jednym zapytaniu:
+    Dijkstra + A* wraz z kosztami odcinków i współrzędnymi.
+    """
+    r = run(ROUTE_PAIR_QUERY, {"s": s, "t": t}, name="route_pair")
+    if not r:
+        raise RuntimeError("Brak trasy")
 
-    return float(r[0]["len"] or 0.0)
\ No newline at end of file
+    return {
+        "dijkstra": _make_route(r[0], "d"),
+        "astar": _make_route(r[0], "a")
+    }
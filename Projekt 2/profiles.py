@@ -0,0 +1,66 @@
+import numpy as np
+
+
+V_MAX_KMH = 140
+V_MAX = V_MAX_KMH / 3.6  # m/s
+
+# prędkość dla klas spoza profilu [km/h]
+DEFAULT_SPEED = 50
+
+SPEED_MAP = {
+    "A": 140,
+    "S": 120,
+    "GP": 100,
+    "G": 90,
+    "Z": 50,
+    "L": 50,
+    "D": 50,
+    "I": 50
+}
+
+# Profile wybierane w momencie zapytania: prędkości [km/h] wg klasaDrogi
+# (brakujące klasy z SPEED_MAP) i opcjonalne kary za skręty [s].
+# Czas odcinka liczy silnik routingu z length_m, więc nowy profil nie
+# wymaga przebudowy grafu ani ponownego importu.
+PROFILES = {
+    "osobowy": {
+        "speeds": {}
+    },
+    "ciezarowy": {
+        "speeds": {"A": 80, "S": 80, "GP": 70, "G": 60, "Z": 40, "L": 40, "D": 30, "I": 30},
+        "turns": {"left": 20, "right": 10, "uturn": 120}
+    },
+    "osobowy_skrety": {
+        "speeds": {},
+        "turns": {"left": 8, "right": 3, "uturn": 60}
+    }
+}
+
+DEFAULT_PROFILE = "osobowy"
+
+# kąt [°] poniżej którego zmiana kierunku to jazda na wprost, powyżej
+# UTURN_ANGLE – zawracanie
+STRAIGHT_ANGLE = 30
+UTURN_ANGLE = 150
+
+
+def get_profile(name=None):
+    try:
+        return PROFILES[name or DEFAULT_PROFILE]
+    except KeyError:
+        raise ValueError(f"Nieznany profil: {name}") from None
+
+def speed_kmh(klasa, profile=None):
+    speeds = get_profile(profile)["speeds"]
+    return speeds.get(klasa, SPEED_MAP.get(klasa, DEFAULT_SPEED))
+
+def speeds_ms(classes, profile=None):
+    # prędkości [m/s] dla listy klas – indeksowane kodem klasy odcinka
+    return np.array([speed_kmh(k, profile) for k in classes], dtype=float) / 3.6
+
+def max_speed_ms(profile=None):
+    speeds = dict(SPEED_MAP, **get_profile(profile)["speeds"])
+    return max(list(speeds.values()) + [DEFAULT_SPEED]) / 3.6
+
+def turn_penalties(profile=None):
+    return get_profile(profile).get("turns")
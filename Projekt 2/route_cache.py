@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class RouteCache:
+    """
+    Ograniczony cache tras (LRU + TTL) z kluczem (source, target, metric).
+    Wpisy są ważne tylko dla jednej wersji grafu – zmiana znacznika wersji
+    (wyniki/graph_version.txt) czyści cały cache.
+    """
+
+    def __init__(self, version_func, maxsize=512, ttl=600):
+        self.version_func = version_func
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+        self._data = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _check_version(self):
+        v = self.version_func()
+        if v != self._version:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._version = v
+
+    def get(self, source, target, metric):
+        key = (source, target, metric)
+        with self._lock:
+            self._check_version()
+
+            item = self._data.get(key)
+            if item is None or time.monotonic() - item[0] > self.ttl:
+                if item is not None:
+                    del self._data[key]
+                    self.evictions += 1
+                self.misses += 1
+                return None
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, source, target, metric, value):
+        key = (source, target, metric)
+        with self._lock:
+            self._check_version()
+
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "version": self._version
+        }
@@ -0,0 +1,608 @@
+import csv
+import hashlib
+import heapq
+import json
+import math
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+from pyproj import Transformer
+
+import profiles
+from spatial import NodeIndex
+
+
+GRAPH_DIR = r"wyniki"
+VERSION_FILE = "graph_version.txt"
+BIN_DIR = "graph_bin"
+# nazwa bieżącego katalogu graph_bin.<wersja>.<id> – podmieniana przez os.replace
+BIN_POINTER = "graph_bin.current"
+# True: łuki czytane wprost z memmap (jedna kopia grafu na wszystkie procesy,
+# ale wyszukiwanie ~1.7x wolniejsze); False: listy Pythona w każdym procesie
+SHARED_ADJACENCY = False
+
+_to_1992 = Transformer.from_crs("EPSG:4326", "EPSG:2180", always_xy=True)
+_to_wgs = Transformer.from_crs("EPSG:2180", "EPSG:4326", always_xy=True)
+
+
+def wgs84_to_1992(lon, lat):
+    return _to_1992.transform(lon, lat)
+
+def to_wgs(x, y):
+    return _to_wgs.transform(x, y)
+
+
+class RoadGraph:
+    """
+    Graf drogowy w postaci CSR (indptr / indices) z wagami na łukach.
+    Każdy odcinek z edges.csv daje dwa łuki; łuk pod prąd odcinka
+    jednokierunkowego (oneway 1: tylko from -> to, -1: tylko to -> from)
+    dostaje wagę inf. Wierzchołki są adresowane wewnętrznie indeksem 0..n-1,
+    na zewnątrz vertex_id.
+    """
+
+    ARRAYS = (
+        "ids", "x", "y", "x_astar", "y_astar",
+        "edge_from", "edge_to", "edge_length", "edge_time", "edge_class_code", "edge_oneway",
+        "indptr", "indices", "arc_source", "arc_edge", "arc_forward", "arc_length", "arc_time"
+    )
+
+    def __init__(self, ids, x, y, x_astar, y_astar,
+                 edge_from, edge_to, length, time, klasa, oneway=None):
+        ids = np.asarray(ids, dtype=np.int64)
+        index = {vid: i for i, vid in enumerate(ids.tolist())}
+        n = len(ids)
+
+        e_from = np.array([index[v] for v in edge_from], dtype=np.int64)
+        e_to = np.array([index[v] for v in edge_to], dtype=np.int64)
+        length = np.asarray(length, dtype=float)
+        time = np.asarray(time, dtype=float)
+        classes, codes = np.unique(np.asarray(klasa, dtype=str), return_inverse=True)
+        if oneway is None:
+            oneway = np.zeros(len(e_from), dtype=np.int8)
+
+        src = np.concatenate([e_from, e_to])
+        dst = np.concatenate([e_to, e_from])
+        eid = np.concatenate([np.arange(len(e_from))] * 2)
+        forward = np.repeat([True, False], len(e_from))
+
+        order = np.argsort(src, kind="stable")
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=n), out=indptr[1:])
+
+        self._setup({
+            "ids": ids,
+            "x": np.asarray(x, dtype=float),
+            "y": np.asarray(y, dtype=float),
+            "x_astar": np.asarray(x_astar, dtype=float),
+            "y_astar": np.asarray(y_astar, dtype=float),
+            "edge_from": e_from,
+            "edge_to": e_to,
+            "edge_length": length,
+            "edge_time": time,
+            # uint8 do 256 klas, powyżej szerszy typ – bez zawijania kodów
+            "edge_class_code": codes.astype(np.min_scalar_type(max(len(classes) - 1, 0))),
+            "edge_oneway": np.asarray(oneway, dtype=np.int8),
+            "indptr": indptr,
+            "indices": dst[order],
+            "arc_source": src[order],
+            "arc_edge": eid[order],
+            "arc_forward": forward[order],
+            "arc_length": length[eid[order]],
+            "arc_time": time[eid[order]]
+        }, classes.tolist())
+        self._index = index
+
+    @classmethod
+    def from_arrays(cls, arrays, classes, mapped=False):
+        g = cls.__new__(cls)
+        g._setup(arrays, classes, mapped)
+        return g
+
+    def _setup(self, arrays, classes, mapped=False):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.classes = list(classes)
+        self.mapped = mapped
+
+        self._index = None
+        self._lists = {}
+        self._node_index = None
+        # liczba węzłów/łuków rozliczonych w ostatnim wyszukiwaniu (benchmark.py)
+        self.last_settled = 0
+
+    @property
+    def n_nodes(self):
+        return len(self.ids)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = {vid: i for i, vid in enumerate(self.ids.tolist())}
+        return self._index
+
+    @property
+    def edge_class(self):
+        return [self.classes[c] for c in self.edge_class_code.tolist()]
+
+    @property
+    def node_index(self):
+        if self._node_index is None:
+            self._node_index = NodeIndex(self.x, self.y)
+        return self._node_index
+
+    def _view(self, arr):
+        # listy Pythona są wielokrotnie szybsze od tablic NumPy w pętli kopca;
+        # memoryview na memmap nie kopiuje danych, patrz SHARED_ADJACENCY
+        return memoryview(arr) if self.mapped and SHARED_ADJACENCY else arr.tolist()
+
+    def arc_weights(self, metric, profile=None):
+        """
+        Wagi łuków: długość albo czas. Bez profilu czas to time_s z importu,
+        z profilem – length_m / prędkość klasy liczone teraz, bez przebudowy.
+        """
+        if metric == "length":
+            w = np.array(self.arc_length, dtype=float)
+        elif profile is None:
+            w = np.array(self.arc_time, dtype=float)
+        else:
+            speed = profiles.speeds_ms(self.classes, profile)
+            w = self.arc_length / speed[self.edge_class_code[self.arc_edge]]
+
+        oneway = self.edge_oneway[self.arc_edge]
+        w[((oneway == 1) & ~self.arc_forward) | ((oneway == -1) & self.arc_forward)] = math.inf
+        return w
+
+    def _adjacency(self, metric, profile=None):
+        key = (metric, profile)
+        if key not in self._lists:
+            self._lists[key] = (
+                self._view(self.indptr),
+                self._view(self.indices),
+                self._view(self.arc_weights(metric, profile))
+            )
+        return self._lists[key]
+
+    def _coords(self):
+        if "coords" not in self._lists:
+            self._lists["coords"] = (
+                self._view(self.x), self._view(self.y), self._view(self.arc_source)
+            )
+        return self._lists["coords"]
+
+    def _turn_cost(self, k1, k2, turns):
+        # kąt między cięciwami odcinków (geometria tylko z końców odcinka)
+        xs, ys, src = self._coords()
+        _, indices, _ = self._adjacency("length")
+        u, v, w = src[k1], indices[k1], indices[k2]
+        if w == u:
+            return turns["uturn"]
+
+        ax, ay = xs[v] - xs[u], ys[v] - ys[u]
+        bx, by = xs[w] - xs[v], ys[w] - ys[v]
+        angle = math.degrees(math.atan2(ax * by - ay * bx, ax * bx + ay * by))
+
+        if abs(angle) < profiles.STRAIGHT_ANGLE:
+            return 0.0
+        if abs(angle) > profiles.UTURN_ANGLE:
+            return turns["uturn"]
+        # x na wschód, y na północ: kąt dodatni = skręt w lewo
+        return turns["left"] if angle > 0 else turns["right"]
+
+    def _search(self, s, t, metric, heuristic=None, profile=None, turns=None):
+        if turns and metric != "length":
+            return self._search_turns(s, t, metric, heuristic, profile, turns)
+
+        indptr, indices, weights = self._adjacency(metric, profile)
+
+        dist = {s: 0.0}
+        pred = {}
+        done = set()
+        heap = [(heuristic(s) if heuristic else 0.0, 0.0, s)]
+
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+
+            if u == t:
+                break
+
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                nd = d + weights[k]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    pred[v] = k
+                    f = nd + heuristic(v) if heuristic else nd
+                    heapq.heappush(heap, (f, nd, v))
+
+        self.last_settled = len(done)
+        if t not in done:
+            return [], [], None
+
+        path, arcs = [t], []
+        while path[-1] != s:
+            k = pred[path[-1]]
+            arcs.append(k)
+            path.append(int(self.arc_source[k]))
+        path.reverse()
+        arcs.reverse()
+
+        return path, arcs, dist[t]
+
+    def _search_turns(self, s, t, metric, heuristic, profile, turns):
+        """
+        Wyszukiwanie po łukach zamiast po węzłach: stanem jest łuk, którym
+        wjechano do węzła, więc na przejściu łuk -> łuk można doliczyć karę
+        za skręt. Zwraca to samo co _search.
+        """
+        if s == t:
+            return [s], [], 0.0
+
+        indptr, indices, weights = self._adjacency(metric, profile)
+
+        dist = {}
+        pred = {}
+        done = set()
+        heap = []
+        for k in range(indptr[s], indptr[s + 1]):
+            d = weights[k]
+            if d < dist.get(k, math.inf):
+                dist[k] = d
+                pred[k] = -1
+                heap.append((d + heuristic(indices[k]) if heuristic else d, d, k))
+        heapq.heapify(heap)
+
+        last = -1
+        while heap:
+            _, d, k = heapq.heappop(heap)
+            if k in done:
+                continue
+            done.add(k)
+
+            u = indices[k]
+            if u == t:
+                last = k
+                break
+
+            for k2 in range(indptr[u], indptr[u + 1]):
+                nd = d + weights[k2]
+                if nd == math.inf:
+                    continue
+                nd += self._turn_cost(k, k2, turns)
+                if nd < dist.get(k2, math.inf):
+                    dist[k2] = nd
+                    pred[k2] = k
+                    f = nd + heuristic(indices[k2]) if heuristic else nd
+                    heapq.heappush(heap, (f, nd, k2))
+
+        self.last_settled = len(done)
+        if last < 0:
+            return [], [], None
+
+        arcs = [last]
+        while pred[arcs[-1]] >= 0:
+            arcs.append(pred[arcs[-1]])
+        arcs.reverse()
+        path = [s] + [int(indices[k]) for k in arcs]
+
+        return path, arcs, dist[last]
+
+    def one_to_many(self, s, targets=None, metric="time", cutoff=math.inf, profile=None):
+        """
+        Dijkstra z jednego źródła. Kończy, gdy wszystkie cele są rozliczone
+        albo koszt przekroczy cutoff. Zwraca koszt i długość (wzdłuż
+        optymalnej ścieżki) dla rozliczonych węzłów.
+        """
+        indptr, indices, weights = self._adjacency(metric, profile)
+        _, _, lengths = self._adjacency("length")
+
+        dist = {s: 0.0}
+        length = {s: 0.0}
+        done = {}
+        left = set(targets) if targets is not None else None
+        heap = [(0.0, s)]
+
+        while heap:
+            d, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            if d > cutoff:
+                break
+            done[u] = (d, length[u])
+
+            if left is not None:
+                left.discard(u)
+                if not left:
+                    break
+
+            for k in range(indptr[u], indptr[u + 1]):
+                v = indices[k]
+                nd = d + weights[k]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    length[v] = length[u] + lengths[k]
+                    heapq.heappush(heap, (nd, v))
+
+        return done
+
+    def dijkstra(self, s, t, metric="length", profile=None, turns=None):
+        return self._search(s, t, metric, None, profile, turns)
+
+    def astar(self, s, t, metric="time", profile=None, turns=None):
+        if "astar" not in self._lists:
+            self._lists["astar"] = (self._view(self.x_astar), self._view(self.y_astar))
+        xa, ya = self._lists["astar"]
+        tx, ty = xa[t], ya[t]
+
+        # x_astar = x / V_MAX, więc odległość euklidesowa to dolne
+        # ograniczenie czasu przejazdu w sekundach; profil wolniejszy
+        # niż V_MAX pozwala na ciaśniejsze ograniczenie
+        scale = profiles.V_MAX / profiles.max_speed_ms(profile)
+
+        def h(v):
+            return math.hypot(xa[v] - tx, ya[v] - ty) * scale
+
+        return self._search(s, t, metric, h, profile, turns)
+
+    def route(self, path, arcs, cost, profile=None):
+        # czasy odcinków wg profilu; kary za skręty są tylko w cost
+        edges = self.arc_edge[arcs]
+        times = self.edge_time[edges]
+        if profile is not None:
+            speed = profiles.speeds_ms(self.classes, profile)
+            times = self.edge_length[edges] / speed[self.edge_class_code[edges]]
+
+        return make_route(
+            self.to_ids(path), cost,
+            self.x[path], self.y[path],
+            self.edge_length[edges], times
+        )
+
+    def nearest(self, x, y, max_dist=150):
+        return self.node_index.nearest(x, y, max_dist)
+
+    def nearest_many(self, x, y, max_dist=150):
+        return self.node_index.nearest_many(x, y, max_dist)
+
+    def to_ids(self, nodes):
+        return self.ids[nodes].tolist()
+
+    def to_index(self, node_ids):
+        return [self.index[v] for v in node_ids]
+
+
+def make_route(node_ids, cost, x, y, edge_lengths, edge_times):
+    """
+    Gotowy wynik wyszukiwania: węzły, koszty odcinków, narastająca długość
+    i czas oraz geometria w WGS84 (jedno wektorowe wywołanie pyproj).
+    """
+    edge_lengths = np.asarray(edge_lengths, dtype=float)
+    edge_times = np.asarray(edge_times, dtype=float)
+    cum_length = np.concatenate([[0.0], np.cumsum(edge_lengths)])
+    cum_time = np.concatenate([[0.0], np.cumsum(edge_times)])
+
+    lon, lat = _to_wgs.transform(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+    return {
+        "nodes": list(node_ids),
+        "cost": cost,
+        "edge_lengths": edge_lengths.tolist(),
+        "edge_times": edge_times.tolist(),
+        "cum_length": cum_length.tolist(),
+        "cum_time": cum_time.tolist(),
+        "length": float(cum_length[-1]),
+        "time": float(cum_time[-1]),
+        "coords": np.column_stack([lat, lon]).tolist()
+    }
+
+
+def load_graph_csv(graph_dir=GRAPH_DIR):
+    ids, x, y, xa, ya = [], [], [], [], []
+    with open(os.path.join(graph_dir, "vertices.csv"), encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            ids.append(int(r["vertex_id"]))
+            x.append(float(r["x"]))
+            y.append(float(r["y"]))
+            xa.append(float(r["x_astar"]))
+            ya.append(float(r["y_astar"]))
+
+    e_from, e_to, length, time, klasa, oneway = [], [], [], [], [], []
+    with open(os.path.join(graph_dir, "edges.csv"), encoding="utf-8") as f:
+        for r in csv.DictReader(f):
+            e_from.append(int(r["from_vertex"]))
+            e_to.append(int(r["to_vertex"]))
+            length.append(float(r["length_m"]))
+            time.append(float(r["time_s"]))
+            klasa.append(r["klasaDrogi"])
+            # starsze edges.csv nie mają kolumny oneway – odcinek dwukierunkowy
+            oneway.append(int(r.get("oneway") or 0))
+
+    return RoadGraph(ids, x, y, xa, ya, e_from, e_to, length, time, klasa, oneway)
+
+
+def savez_atomic(path, **arrays):
+    """
+    np.savez przez plik tymczasowy i os.replace – czytelnik widzi stary albo
+    nowy komplet tablic, nigdy plik urwany w połowie zapisu.
+    """
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _bin_dir(graph_dir):
+    # katalog wskazany przez BIN_POINTER; bez wskaźnika – stary układ wyniki/graph_bin
+    try:
+        with open(os.path.join(graph_dir, BIN_POINTER), encoding="utf-8") as f:
+            return os.path.join(graph_dir, f.read().strip())
+    except FileNotFoundError:
+        return os.path.join(graph_dir, BIN_DIR)
+
+def save_binary(graph, graph_dir=GRAPH_DIR, version=None):
+    """
+    Graf jako surowe tablice .npy (CSR, współrzędne, długość, czas, kod klasy)
+    w wyniki/graph_bin.<wersja>.<id> – ładowane przez np.load(mmap_mode="r")
+    bez parsowania i bez kopiowania, więc procesy routingu dzielą jedną kopię
+    w pamięci.
+
+    Pliki zmapowane przez działające procesy nigdy nie są nadpisywane: każdy
+    zapis idzie do nowego katalogu, który staje się bieżący przez os.replace
+    wskaźnika BIN_POINTER. Stare katalogi są usuwane, o ile nikt ich nie
+    trzyma otwartych (na Windows zostają do następnego zapisu).
+    """
+    if version is None:
+        version = graph_version(graph_dir)
+
+    name = f"{BIN_DIR}.{version}.{uuid.uuid4().hex[:8]}"
+    out = os.path.join(graph_dir, name)
+    os.makedirs(out)
+
+    for arr in RoadGraph.ARRAYS:
+        np.save(os.path.join(out, f"{arr}.npy"), np.ascontiguousarray(getattr(graph, arr)))
+
+    with open(os.path.join(out, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "version": version,
+            "classes": graph.classes,
+            "n_nodes": int(graph.n_nodes),
+            "n_edges": int(len(graph.edge_from))
+        }, f)
+
+    pointer = os.path.join(graph_dir, BIN_POINTER)
+    with open(pointer + ".tmp", "w", encoding="utf-8") as f:
+        f.write(name + "\n")
+    os.replace(pointer + ".tmp", pointer)
+
+    for old in os.listdir(graph_dir):
+        if old != name and (old == BIN_DIR or old.startswith(BIN_DIR + ".")) \
+                and os.path.isdir(os.path.join(graph_dir, old)):
+            shutil.rmtree(os.path.join(graph_dir, old), ignore_errors=True)
+
+def load_binary(graph_dir=GRAPH_DIR):
+    src = _bin_dir(graph_dir)
+    with open(os.path.join(src, "meta.json"), encoding="utf-8") as f:
+        meta = json.load(f)
+
+    arrays = {
+        name: np.load(os.path.join(src, f"{name}.npy"), mmap_mode="r")
+        for name in RoadGraph.ARRAYS
+    }
+    return RoadGraph.from_arrays(arrays, meta["classes"], mapped=True), meta["version"]
+
+def load_graph(graph_dir=GRAPH_DIR):
+    # format binarny, jeśli jest kompletny i aktualny; inaczej parsowanie CSV
+    src = _bin_dir(graph_dir)
+    names = ["meta.json"] + [f"{name}.npy" for name in RoadGraph.ARRAYS]
+    if all(os.path.exists(os.path.join(src, name)) for name in names):
+        try:
+            graph, version = load_binary(graph_dir)
+        except FileNotFoundError:
+            # katalog usunięty przez równoległy save_binary między odczytem wskaźnika a np.load
+            graph, version = None, None
+        if version == graph_version(graph_dir):
+            return graph
+
+    return load_graph_csv(graph_dir)
+
+
+def write_graph_version(graph_dir=GRAPH_DIR):
+    # znacznik wersji = skrót treści CSV, zapisywany przez load_data.py
+    h = hashlib.sha1()
+    for name in ("vertices.csv", "edges.csv"):
+        with open(os.path.join(graph_dir, name), "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+
+    version = h.hexdigest()[:16]
+    with open(os.path.join(graph_dir, VERSION_FILE), "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+    return version
+
+def graph_version(graph_dir=GRAPH_DIR):
+    try:
+        with open(os.path.join(graph_dir, VERSION_FILE), encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "mtime:" + ":".join(
+            str(os.stat(os.path.join(graph_dir, name)).st_mtime_ns)
+            for name in ("vertices.csv", "edges.csv")
+        )
+
+
+_graph = None
+_graph_version = None
+
+def get_graph():
+    # load_data.py nadpisuje wyniki/* i znacznik wersji – wtedy graf i indeks budujemy od nowa
+    global _graph, _graph_version
+    version = graph_version()
+    if _graph is None or version != _graph_version:
+        _graph = load_graph()
+        _graph_version = version
+    return _graph
+
+
+# Te same sygnatury co w neo.py, ID węzłów to vertex_id z vertices.csv
+
+def find_nearest_node(x, y, max_dist=150):
+    g = get_graph()
+    i = g.nearest(x, y, max_dist)
+
+    if i is None:
+        raise RuntimeError("Brak drogi w pobliżu punktu")
+
+    return int(g.ids[i])
+
+def find_nearest_nodes(xs, ys, max_dist=150):
+    g = get_graph()
+    idx = g.nearest_many(xs, ys, max_dist)
+    return np.where(idx >= 0, g.ids[np.maximum(idx, 0)], -1)
+
+def dijkstra_length(s, t):
+    g = get_graph()
+    path, _, cost = g.dijkstra(g.index[s], g.index[t], "length")
+    return g.to_ids(path), cost
+
+def astar_time(s, t, profile=None):
+    g = get_graph()
+    path, _, cost = g.astar(g.index[s], g.index[t], "time", profile, profiles.turn_penalties(profile))
+    return g.to_ids(path), cost
+
+def shortest_route(s, t):
+    g = get_graph()
+    path, arcs, cost = g.dijkstra(g.index[s], g.index[t], "length")
+    return g.route(path, arcs, cost) if path else None
+
+def fastest_route(s, t, profile=None):
+    # profil z profiles.PROFILES wybierany przy zapytaniu (None = czasy z importu)
+    g = get_graph()
+    path, arcs, cost = g.astar(g.index[s], g.index[t], "time", profile, profiles.turn_penalties(profile))
+    return g.route(path, arcs, cost, profile) if path else None
+
+def get_coords(node_ids):
+    g = get_graph()
+    nodes = g.to_index(node_ids)
+    lon, lat = _to_wgs.transform(g.x[nodes], g.y[nodes])
+    return np.column_stack([lat, lon]).tolist()
+
+def get_path_stats(node_ids):
+    g = get_graph()
+    nodes = g.to_index(node_ids)
+
+    total = 0.0
+    for a, b in zip(nodes, nodes[1:]):
+        arcs = range(g.indptr[a], g.indptr[a + 1])
+        total += min(g.edge_length[g.arc_edge[k]] for k in arcs if g.indices[k] == b)
+
+    return total
@@ -0,0 +1,80 @@
+import math
+import os
+
+import numpy as np
+import shapefile
+
+
+CHUNK_SIZE = 50000
+
+
+def _length(points, parts):
+    # długość planarna linii wieloczęściowej – bez odcinków między częściami
+    total = 0.0
+    bounds = list(parts[1:]) + [len(points)]
+    for start, end in zip(parts, bounds):
+        for (x0, y0), (x1, y1) in zip(points[start:end - 1], points[start + 1:end]):
+            total += math.hypot(x1 - x0, y1 - y0)
+    return total
+
+
+def _oneway(value):
+    # 1: tylko start -> end, -1: tylko end -> start, puste/0: oba kierunki
+    try:
+        return max(-1, min(1, int(value)))
+    except (TypeError, ValueError):
+        return 0
+
+
+def iter_segments(paths, field="klasaDrogi", oneway_field=None):
+    """
+    Strumień odcinków z plików .shp/.dbf (pyshp, bez arcpy):
+    (start, end, length, klasa, oneway). Kolejne pliki czytane w jednym
+    przebiegu, w pamięci jest zawsze tylko bieżący rekord.
+    """
+    fields = [field] + ([oneway_field] if oneway_field else [])
+
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Brak pliku: {path}")
+            continue
+
+        with shapefile.Reader(path) as r:
+            for sr in r.iterShapeRecords(fields=fields):
+                pts = sr.shape.points
+                if not pts:
+                    continue
+
+                yield (
+                    (pts[0][0], pts[0][1]),
+                    (pts[-1][0], pts[-1][1]),
+                    _length(pts, sr.shape.parts or [0]),
+                    sr.record[0],
+                    _oneway(sr.record[1]) if oneway_field else 0
+                )
+
+
+def iter_chunks(paths, chunk_size=CHUNK_SIZE, field="klasaDrogi", oneway_field=None):
+    """
+    Te same odcinki w paczkach NumPy: start (n, 2), end (n, 2), length (n,),
+    klasa (n,), oneway (n,). Pamięć zależy od chunk_size, nie od wielkości warstwy.
+    """
+    buf = []
+    for seg in iter_segments(paths, field, oneway_field):
+        buf.append(seg)
+        if len(buf) >= chunk_size:
+            yield _to_arrays(buf)
+            buf = []
+    if buf:
+        yield _to_arrays(buf)
+
+
+def _to_arrays(buf):
+    starts, ends, lengths, klasy, oneway = zip(*buf)
+    return {
+        "start": np.array(starts, dtype=float),
+        "end": np.array(ends, dtype=float),
+        "length": np.array(lengths, dtype=float),
+        "klasa": np.array(klasy, dtype=object),
+        "oneway": np.array(oneway, dtype=np.int8)
+    }
@@ -0,0 +1,179 @@
+import math
+
+import numpy as np
+
+
+class VertexGrid:
+    """
+    Haszowana siatka do przyciągania końców odcinków do wierzchołków.
+    Komórka ma bok równy tolerancji, więc kandydaci leżą w sąsiedztwie 3x3.
+    Zwraca te same ID co liniowy skan (pierwszy, czyli najmniejszy, pasujący).
+    """
+
+    def __init__(self, tolerancja, vertices=None):
+        self.tol = tolerancja
+        self.cell = tolerancja
+        self.cells = {}
+        self.vertices = vertices if vertices is not None else {}
+
+        for vid, point in self.vertices.items():
+            self._insert(vid, point)
+
+    def _key(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def _insert(self, vid, point):
+        self.cells.setdefault(self._key(*point), []).append(vid)
+
+    def _find(self, point, cx, cy):
+        best = None
+        for i in (cx - 1, cx, cx + 1):
+            for j in (cy - 1, cy, cy + 1):
+                for vid in self.cells.get((i, j), ()):
+                    if best is not None and vid >= best:
+                        break
+                    x, y = self.vertices[vid]
+                    if math.hypot(x - point[0], y - point[1]) <= self.tol:
+                        best = vid
+                        break
+        return best
+
+    def _find_or_create(self, point, cx, cy):
+        vid = self._find(point, cx, cy)
+        if vid is not None:
+            return vid
+
+        new_id = len(self.vertices) + 1
+        self.vertices[new_id] = point
+        self.cells.setdefault((cx, cy), []).append(new_id)
+        return new_id
+
+    def find_or_create(self, point):
+        return self._find_or_create(point, *self._key(*point))
+
+    def snap_many(self, points):
+        pts = np.asarray(points, dtype=float).reshape(-1, 2)
+        keys = np.floor(pts / self.cell).astype(np.int64)
+
+        out = np.empty(len(pts), dtype=np.int64)
+        for i, ((x, y), (cx, cy)) in enumerate(zip(pts.tolist(), keys.tolist())):
+            out[i] = self._find_or_create((x, y), cx, cy)
+        return out
+
+    def snap_endpoints(self, starts, ends):
+        starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+        ends = np.asarray(ends, dtype=float).reshape(-1, 2)
+
+        # kolejność start0, end0, start1, ... jak w pętli po odcinkach
+        pts = np.empty((len(starts) * 2, 2), dtype=float)
+        pts[0::2] = starts
+        pts[1::2] = ends
+
+        return self.snap_many(pts).reshape(-1, 2)
+
+
+class NodeIndex:
+    """
+    Upakowana siatka do wyszukiwania najbliższego węzła w EPSG:2180.
+    Punkty są posortowane po kluczu komórki, a każda komórka to ciągły
+    wycinek tablic współrzędnych (jak CSR).
+    """
+
+    def __init__(self, x, y, cell=50.0):
+        self.cell = float(cell)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+
+        cx = np.floor(x / self.cell).astype(np.int64)
+        cy = np.floor(y / self.cell).astype(np.int64)
+        self.cx0, self.cy0 = int(cx.min()), int(cy.min())
+        self.nx = int(cx.max()) - self.cx0 + 1
+        self.ny = int(cy.max()) - self.cy0 + 1
+        keys = (cx - self.cx0) * self.ny + (cy - self.cy0)
+
+        self.order = np.argsort(keys, kind="stable")
+        self.xs = x[self.order]
+        self.ys = y[self.order]
+
+        self.keys, starts, counts = np.unique(
+            keys[self.order], return_index=True, return_counts=True
+        )
+        self.starts = starts.astype(np.int64)
+        self.counts = counts.astype(np.int64)
+        self.max_count = int(self.counts.max())
+
+        self._cells = {
+            k: (s, s + c)
+            for k, s, c in zip(self.keys.tolist(), self.starts.tolist(), self.counts.tolist())
+        }
+        self._xs = self.xs.tolist()
+        self._ys = self.ys.tolist()
+        self._order = self.order.tolist()
+
+    def _cell(self, x, y):
+        return (math.floor(x / self.cell) - self.cx0,
+                math.floor(y / self.cell) - self.cy0)
+
+    def nearest(self, x, y, max_dist=150):
+        cx, cy = self._cell(x, y)
+        rings = int(math.ceil(max_dist / self.cell))
+        best, best_d = -1, max_dist
+
+        for r in range(rings + 1):
+            # pierścień r leży co najmniej (r - 1) * cell od punktu
+            if best >= 0 and (r - 1) * self.cell > best_d:
+                break
+
+            for i in range(cx - r, cx + r + 1):
+                step = 1 if i in (cx - r, cx + r) else 2 * r or 1
+                if not 0 <= i < self.nx:
+                    continue
+                for j in range(cy - r, cy + r + 1, step):
+                    if not 0 <= j < self.ny:
+                        continue
+                    span = self._cells.get(i * self.ny + j)
+                    if span is None:
+                        continue
+                    for k in range(*span):
+                        d = math.hypot(self._xs[k] - x, self._ys[k] - y)
+                        if d < best_d or (d == best_d and best >= 0 and self._order[k] < best):
+                            best, best_d = self._order[k], d
+
+        return best if best >= 0 else None
+
+    def nearest_many(self, x, y, max_dist=150):
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+
+        cx = np.floor(x / self.cell).astype(np.int64) - self.cx0
+        cy = np.floor(y / self.cell).astype(np.int64) - self.cy0
+        rings = int(math.ceil(max_dist / self.cell))
+
+        best = np.full(len(x), -1, dtype=np.int64)
+        best_d = np.full(len(x), float(max_dist))
+
+        for di in range(-rings, rings + 1):
+            for dj in range(-rings, rings + 1):
+                i, j = cx + di, cy + dj
+                keys = i * self.ny + j
+                pos = np.searchsorted(self.keys, keys)
+                pos = np.minimum(pos, len(self.keys) - 1)
+                hit = (self.keys[pos] == keys) & (i >= 0) & (i < self.nx) & (j >= 0) & (j < self.ny)
+                start = self.starts[pos]
+                count = np.where(hit, self.counts[pos], 0)
+
+                for slot in range(self.max_count):
+                    m = count > slot
+                    if not m.any():
+                        break
+                    k = start[m] + slot
+                    d = np.hypot(self.xs[k] - x[m], self.ys[k] - y[m])
+                    cand = self.order[k]
+
+                    b = best[m]
+                    better = (d < best_d[m]) | ((d == best_d[m]) & (b >= 0) & (cand < b))
+                    idx = np.flatnonzero(m)[better]
+                    best[idx] = cand[better]
+                    best_d[idx] = d[better]
+
+        return best
@@ -0,0 +1,171 @@
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapefile
+
+from spatial import VertexGrid
+from shp_reader import iter_chunks
+
+
+def tile_bbox(path):
+    with shapefile.Reader(path) as r:
+        return tuple(r.bbox)
+
+
+def build_tile(task):
+    """
+    Snapping jednego kafla we własnym procesie. ID wierzchołków są lokalne
+    (1..n w kolejności utworzenia), sklejanie z sąsiadami robi stitch_tile.
+    Odcinki każdej paczki trafiają od razu do pliku .npz w tmp_dir – do
+    procesu głównego wracają tylko wierzchołki kafla i lista plików.
+    """
+    path, own, tolerancja, chunk_size, oneway_field, tmp_dir = task
+
+    t0 = time.perf_counter()
+    vertices = {}
+    grid = VertexGrid(tolerancja, vertices)
+    chunks = []
+    segments = 0
+
+    # czas odczytu .shp liczony osobno od snappingu
+    read_time = 0.0
+    t_read = time.perf_counter()
+    for chunk in iter_chunks([path], chunk_size, oneway_field=oneway_field):
+        read_time += time.perf_counter() - t_read
+        out = os.path.join(tmp_dir, f"{own}_{len(chunks)}.npz")
+        np.savez(
+            out,
+            ids=grid.snap_endpoints(chunk["start"], chunk["end"]),
+            klasa=chunk["klasa"],
+            length=chunk["length"],
+            oneway=chunk["oneway"]
+        )
+        chunks.append(out)
+        segments += len(chunk["length"])
+        t_read = time.perf_counter()
+    read_time += time.perf_counter() - t_read
+
+    return {
+        "path": path,
+        "vertices": np.array(list(vertices.values()), dtype=float).reshape(-1, 2),
+        "chunks": chunks,
+        "segments": segments,
+        "read_time": read_time,
+        "snap_time": time.perf_counter() - t0 - read_time
+    }
+
+
+def seam_mask(points, own, bboxes, tolerancja):
+    # wierzchołki w zasięgu innego kafla – tylko one mogą mieć odpowiednik po drugiej stronie szwu
+    x, y = points[:, 0], points[:, 1]
+    mask = np.zeros(len(points), dtype=bool)
+
+    for j, (x0, y0, x1, y1) in enumerate(bboxes):
+        if j == own:
+            continue
+        mask |= (
+            (x >= x0 - tolerancja) & (x <= x1 + tolerancja) &
+            (y >= y0 - tolerancja) & (y <= y1 + tolerancja)
+        )
+
+    return mask
+
+
+def stitch_tile(tile, own, bboxes, tolerancja, vertices, seam, seam_gid):
+    """
+    Nadaje globalne ID wierzchołkom kafla. Wierzchołki przy szwie są
+    przyciągane przez wspólną siatkę, więc punkty z różnych kafli leżące
+    w TOLERANCJA dostają to samo ID. Zwraca tablicę lokalne ID -> globalne
+    ID (indeks 0 nieużywany) i liczbę wierzchołków przy szwie.
+    """
+    pts = tile["vertices"]
+    cand = seam_mask(pts, own, bboxes, tolerancja)
+
+    gids = np.zeros(len(pts) + 1, dtype=np.int64)
+    for lid, (point, on_seam) in enumerate(zip(pts.tolist(), cand.tolist()), start=1):
+        point = tuple(point)
+        gid = None
+
+        if on_seam:
+            sid = seam.find_or_create(point)
+            gid = seam_gid.get(sid)
+
+        if gid is None:
+            gid = len(vertices) + 1
+            vertices[gid] = point
+            if on_seam:
+                seam_gid[sid] = gid
+
+        gids[lid] = gid
+
+    return gids, int(cand.sum())
+
+
+def iter_tile_chunks(tile, gids):
+    # paczki odcinków kafla z dysku, po jednej naraz, z globalnymi ID
+    for path in tile["chunks"]:
+        with np.load(path, allow_pickle=True) as z:
+            chunk = {k: z[k] for k in ("ids", "klasa", "length", "oneway")}
+        os.remove(path)
+        yield gids[chunk["ids"]], chunk["klasa"], chunk["length"], chunk["oneway"]
+
+
+def build_tiles(paths, tolerancja, chunk_size, vertices, workers=None, oneway_field=None):
+    """
+    Buduje graf z wielu kafli: snapping równolegle (jeden kafel = jeden
+    proces), potem sklejanie szwów w kolejności PATHS. Zwraca kolejne paczki
+    jako (ids (n, 2), klasa, length, oneway, stats) z globalnymi ID, gdzie
+    stats to czasy odczytu, snappingu i sklejania kafla; vertices jest
+    uzupełniany globalnymi wierzchołkami.
+
+    Kafel jest oddawany paczkami po chunk_size odcinków (statystyki kafla
+    przy pierwszej paczce), a paczki czekają w plikach tymczasowych –
+    pamięć nie rośnie z wielkością warstwy, tylko z liczbą wierzchołków.
+    """
+    missing = [p for p in paths if not os.path.exists(p)]
+    for p in missing:
+        print(f"Brak pliku: {p}")
+    paths = [p for p in paths if p not in missing]
+
+    bboxes = [tile_bbox(p) for p in paths]
+    tmp_dir = tempfile.mkdtemp(prefix="tiles_")
+    tasks = [(p, own, tolerancja, chunk_size, oneway_field, tmp_dir) for own, p in enumerate(paths)]
+
+    seam = VertexGrid(tolerancja)
+    seam_gid = {}
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    pool = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    try:
+        results = pool.map(build_tile, tasks) if pool else map(build_tile, tasks)
+
+        for own, tile in enumerate(results):
+            t0 = time.perf_counter()
+            gids, n_seam = stitch_tile(tile, own, bboxes, tolerancja, vertices, seam, seam_gid)
+            stats = {
+                "segments": tile["segments"],
+                "vertices": len(tile["vertices"]),
+                "seam": n_seam,
+                "read_time": tile["read_time"],
+                "snap_time": tile["snap_time"],
+                "stitch_time": time.perf_counter() - t0
+            }
+            print(
+                f"   {os.path.basename(tile['path'])}: {stats['segments']} odcinków, "
+                f"{stats['vertices']} wierzchołków, {n_seam} przy szwie, "
+                f"odczyt {stats['read_time']:.2f} s, snapping {stats['snap_time']:.2f} s"
+            )
+
+            empty = dict.fromkeys(stats, 0)
+            for ids, klasa, length, oneway in iter_tile_chunks(tile, gids):
+                yield ids, klasa, length, oneway, dict(stats, segments=len(length))
+                stats = empty
+    finally:
+        if pool:
+            pool.shutdown()
+        shutil.rmtree(tmp_dir, ignore_errors=True)